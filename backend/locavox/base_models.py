@@ -1,6 +1,29 @@
+import json
 from datetime import datetime
-from typing import Dict, Any
-from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
+from pydantic import BaseModel, PrivateAttr
+
+# Serialize metadata with orjson when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dump_metadata(metadata: Optional[Dict[str, Any]]) -> str:
+    """Serialize message metadata as compact JSON (None becomes {})"""
+    if orjson is not None:
+        return orjson.dumps(metadata or {}).decode()
+    return json.dumps(metadata or {}, separators=(",", ":"))
+
+
+def load_metadata(metadata_json: str) -> Optional[Dict[str, Any]]:
+    """Parse stored message metadata (an empty string becomes None)"""
+    if not metadata_json:
+        return None
+    if orjson is not None:
+        return orjson.loads(metadata_json)
+    return json.loads(metadata_json)
 
 
 class Message(BaseModel):
@@ -8,4 +31,11 @@ class Message(BaseModel):
     content: str
     userId: str
     timestamp: datetime
-    metadata: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Optional[Dict[str, Any]] = None  # None is treated as empty
+    _metadata_json: Optional[str] = PrivateAttr(default=None)
+
+    def metadata_json(self) -> str:
+        """Metadata as compact JSON, serialized once per message"""
+        if self._metadata_json is None:
+            self._metadata_json = dump_metadata(self.metadata)
+        return self._metadata_json
@@ -1,48 +1,37 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 from enum import Enum
+from typing import Optional
 import logging  # Add logging import
 
 # Set up basic logger (will be replaced by the centralized logger later if available)
 logger = logging.getLogger(__name__)
 
-# Load environment variables first
-load_dotenv_file = os.getenv("LOCAVOX_DOT_ENV_FILE", ".env")
-load_dotenv(dotenv_path=load_dotenv_file)
+# Load environment variables first. The .env file is parsed once per process
+# tree: worker processes inherit both the loaded values and the marker.
+if not os.environ.get("LOCAVOX_DOTENV_DONE"):
+    load_dotenv_file = os.getenv("LOCAVOX_DOT_ENV_FILE", ".env")
+    load_dotenv(dotenv_path=load_dotenv_file)
+    os.environ["LOCAVOX_DOTENV_DONE"] = "1"
 
 # Database configuration
-DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data")
-DATABASE_PATH = os.getenv("LOCAVOX_DATABASE_PATH", DEFAULT_DB_PATH)
+DEFAULT_DB_PATH = str(Path(__file__).resolve().parent.parent / "data")
 
 # OpenAI configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY:
-    OPENAI_API_KEY = OPENAI_API_KEY.strip()
-    if not OPENAI_API_KEY:  # Empty string after stripping
-        OPENAI_API_KEY = None
-
 OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
 OPENAI_EMBEDDING_DIMENSION = 1536
 
-# Use LLM-powered features only if API key is available
-USE_LLM_BY_DEFAULT = bool(OPENAI_API_KEY)
-
 # Sentence transformer configuration
 SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
 SENTENCE_TRANSFORMER_DIMENSION = 384
+SENTENCE_TRANSFORMER_BACKENDS = ("torch", "onnx", "openvino")
 
 # LLM usage control
 USE_LLM_BY_DEFAULT = False  # Controls whether LLM features are enabled by default
 
 # Maximum number of messages a user can post
-MAX_MESSAGES_PER_USER = 100  # Default value, can be overridden in environment
-
-# Load settings from environment variables
-if os.getenv("MAX_MESSAGES_PER_USER"):
-    try:
-        MAX_MESSAGES_PER_USER = int(os.getenv("MAX_MESSAGES_PER_USER"))
-    except ValueError:
-        logger.warning("Invalid MAX_MESSAGES_PER_USER value, using default")
+DEFAULT_MAX_MESSAGES_PER_USER = 100  # Can be overridden in environment
 
 
 # Model selection
@@ -51,11 +40,102 @@ class EmbeddingModel(str, Enum):
     SENTENCE_TRANSFORMER = "sentence-transformer"
 
 
-# Use this to select which embedding model to use
-EMBEDDING_MODEL = EmbeddingModel(os.getenv("EMBEDDING_MODEL", "sentence-transformer"))
+def _read_database_path() -> str:
+    return os.getenv("LOCAVOX_DATABASE_PATH", DEFAULT_DB_PATH)
+
+
+def _read_openai_api_key():
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key:
+        api_key = api_key.strip()
+    return api_key or None  # Empty string after stripping counts as unset
+
+
+def _read_max_messages_per_user() -> int:
+    value = os.getenv("MAX_MESSAGES_PER_USER")
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning("Invalid MAX_MESSAGES_PER_USER value, using default")
+    return DEFAULT_MAX_MESSAGES_PER_USER
+
+
+def _read_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+
+
+def _read_openai_rate_limit(name: str) -> Optional[int]:
+    # Requests or tokens per minute allowed per process; unset means unlimited
+    value = os.getenv(name)
+    if value:
+        try:
+            limit = int(value)
+            return limit if limit > 0 else None
+        except ValueError:
+            logger.warning("Invalid %s value, not rate limiting", name)
+    return None
+
+
+def _read_openai_rpm() -> Optional[int]:
+    return _read_openai_rate_limit("OPENAI_RPM")
+
+
+def _read_openai_tpm() -> Optional[int]:
+    return _read_openai_rate_limit("OPENAI_TPM")
+
+
+def _read_embedding_model() -> EmbeddingModel:
+    # Use this to select which embedding model to use
+    return EmbeddingModel(os.getenv("EMBEDDING_MODEL", "sentence-transformer"))
+
+
+def _read_sentence_transformer_backend() -> str:
+    # "onnx" and "openvino" run fused CPU kernels and need the matching extras
+    # (sentence-transformers[onnx] or sentence-transformers[openvino])
+    backend = os.getenv("SENTENCE_TRANSFORMER_BACKEND", "torch").strip().lower()
+    if backend not in SENTENCE_TRANSFORMER_BACKENDS:
+        logger.warning("Invalid SENTENCE_TRANSFORMER_BACKEND value, using torch")
+        return "torch"
+    return backend
+
+
+def _read_sentence_transformer_quantize() -> bool:
+    # int8 dynamic quantization speeds up CPU inference but shifts the vectors
+    # away from the fp32 ones already stored, so it is opt-in for new databases
+    return _read_flag("SENTENCE_TRANSFORMER_QUANTIZE")
+
+
+def _read_preload_embedding_model() -> bool:
+    # Load the model when locavox.main is imported, e.g. in a gunicorn --preload
+    # master, so forked workers share its weights instead of loading their own
+    return _read_flag("LOCAVOX_PRELOAD_EMBEDDING_MODEL")
+
+
+# Environment-derived settings are parsed on first access rather than at import.
+# The database directory itself is created by TopicStorage when a topic connects.
+_LAZY_SETTINGS = {
+    "DATABASE_PATH": _read_database_path,
+    "OPENAI_API_KEY": _read_openai_api_key,
+    "MAX_MESSAGES_PER_USER": _read_max_messages_per_user,
+    "EMBEDDING_MODEL": _read_embedding_model,
+    "SENTENCE_TRANSFORMER_BACKEND": _read_sentence_transformer_backend,
+    "SENTENCE_TRANSFORMER_QUANTIZE": _read_sentence_transformer_quantize,
+    "PRELOAD_EMBEDDING_MODEL": _read_preload_embedding_model,
+    "OPENAI_RPM": _read_openai_rpm,
+    "OPENAI_TPM": _read_openai_tpm,
+}
+
+
+def __getattr__(name: str):
+    """Resolve a lazy setting once and cache it as a regular module attribute"""
+    try:
+        loader = _LAZY_SETTINGS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = globals()[name] = loader()
+    return value
 
-# Ensure the database directory exists
-os.makedirs(DATABASE_PATH, exist_ok=True)
 
 # Try to import and use the centralized logger if available
 try:
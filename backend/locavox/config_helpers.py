@@ -1,43 +1,27 @@
 """Helper functions for configuration management, especially for testing"""
 
+from contextvars import ContextVar
+
 from . import config
 
-# Use a simple global dict for test overrides instead of thread-local storage
-# This is more reliable across test scenarios with FastAPI's TestClient
-_test_values = {}
+# Test overrides live in a context variable so concurrent tests and tasks each
+# see their own values. Starlette's TestClient copies the caller's context into
+# the app, so overrides set by a test are visible to the requests it makes.
+_test_values: ContextVar[dict] = ContextVar("_test_values", default={})
 
 
 def set_test_value(key, value):
     """Set a configuration value specifically for tests"""
-    global _test_values
-    _test_values[key] = value
-
-    # Directly update the config module's attribute as well for maximum compatibility
-    if hasattr(config, key):
-        setattr(config, key, value)
+    overrides = dict(_test_values.get())
+    overrides[key] = value
+    _test_values.set(overrides)
 
 
 def get_message_limit():
     """Get the message limit, respecting test overrides if present"""
-    # Check for an override first
-    if "MAX_MESSAGES_PER_USER" in _test_values:
-        return _test_values["MAX_MESSAGES_PER_USER"]
-
-    # Otherwise use the config value
-    return config.MAX_MESSAGES_PER_USER
+    return _test_values.get().get("MAX_MESSAGES_PER_USER", config.MAX_MESSAGES_PER_USER)
 
 
 def reset_test_values():
     """Reset all test configuration values"""
-    global _test_values
-    # Store the keys to reset in config module
-    keys_to_reset = list(_test_values.keys())
-
-    # Clear the test values dictionary
-    _test_values.clear()
-
-    # Reset any directly modified config attributes
-    # (Note: This requires knowing the original values)
-    # For now, just set MAX_MESSAGES_PER_USER back to its default
-    if "MAX_MESSAGES_PER_USER" in keys_to_reset:
-        config.MAX_MESSAGES_PER_USER = 100  # Default value
+    _test_values.set({})
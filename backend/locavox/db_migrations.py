@@ -1,3 +1,4 @@
+import asyncio
 import os
 import lance
 from . import config
@@ -7,6 +8,30 @@ from .logger import setup_logger
 logger = setup_logger(__name__)
 
 
+def _ensure_topic_user_id_index(database_dir: str, topic: str):
+    """Create the userId index for a single topic if it doesn't exist yet"""
+    # Open the Lance dataset directly; only a missing table needs special handling
+    table_path = os.path.join(database_dir, topic, "messages.lance")
+    try:
+        ds = lance.dataset(table_path)
+    except ValueError:
+        logger.debug(f"No messages table for topic {topic}, skipping index creation")
+        return
+
+    # Check if index exists
+    indices = ds.list_indices()
+    if not any(idx["name"] == "userId_idx" for idx in indices):
+        logger.info(f"Creating userId index for topic {topic}")
+        # A BTree scalar index turns userId equality filters into index
+        # lookups instead of full scans (user IDs are high-cardinality)
+        try:
+            ds.create_scalar_index("userId", index_type="BTREE", name="userId_idx")
+        except AttributeError:
+            # Older Lance releases only provide the generic create_index
+            ds.create_index("userId", index_name="userId_idx", index_type="flat")
+        logger.info(f"Successfully created userId index for topic {topic}")
+
+
 async def ensure_user_id_index():
     """
     Ensure that userId field is indexed for efficient querying.
@@ -14,34 +39,29 @@ async def ensure_user_id_index():
     """
     try:
         database_dir = config.DATABASE_PATH
-        if not os.path.exists(database_dir):
+
+        # Get all topic directories; scandir entries carry their file type, so
+        # one directory read replaces an isdir() stat per entry
+        try:
+            with os.scandir(database_dir) as entries:
+                topic_dirs = [entry.name for entry in entries if entry.is_dir()]
+        except FileNotFoundError:
             logger.info(
                 f"Database directory {database_dir} doesn't exist yet, skipping index creation"
             )
             return
 
-        # Get all topic directories
-        topic_dirs = [
-            d
-            for d in os.listdir(database_dir)
-            if os.path.isdir(os.path.join(database_dir, d))
-        ]
-
-        for topic in topic_dirs:
-            table_path = os.path.join(database_dir, topic, "messages")
-            if not os.path.exists(table_path):
-                continue
-
-            # Open the Lance dataset
-            ds = lance.dataset(table_path)
-
-            # Check if index exists
-            indices = ds.list_indices()
-            if not any(idx["name"] == "userId_idx" for idx in indices):
-                logger.info(f"Creating userId index for topic {topic}")
-                # Create index on userId for efficient filtering
-                ds.create_index("userId", index_name="userId_idx", index_type="flat")
-                logger.info(f"Successfully created userId index for topic {topic}")
+        # Lance calls block, so index the topics concurrently in worker threads
+        results = await asyncio.gather(
+            *(
+                asyncio.to_thread(_ensure_topic_user_id_index, database_dir, topic)
+                for topic in topic_dirs
+            ),
+            return_exceptions=True,
+        )
+        for topic, result in zip(topic_dirs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error ensuring userId index for topic {topic}: {result}")
 
     except Exception as e:
         logger.error(f"Error ensuring userId index: {e}")
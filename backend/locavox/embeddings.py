@@ -1,79 +1,310 @@
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import threading
+from collections import OrderedDict
 import numpy as np
-from typing import List
+from typing import Any, Dict, List, Optional
 from . import config
 from .logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Number of texts sent through the sentence transformer per forward pass
+ENCODE_BATCH_SIZE = 64
+
+# Maximum number of inputs accepted by one OpenAI embeddings request
+OPENAI_MAX_BATCH_SIZE = 2048
+
+# Bound tail latency of OpenAI embedding calls
+OPENAI_TIMEOUT = 10
+OPENAI_MAX_RETRIES = 3
+
+# Models and clients are shared by every EmbeddingGenerator in the process
+_MODEL_CACHE: Dict[str, Any] = {}
+_MODEL_LOCK = threading.Lock()
+_openai_client = None
+_async_openai_client = None
+
+# Recently generated embeddings, keyed by backend and a digest of the text
+EMBEDDING_CACHE_SIZE = 10_000
+_embedding_cache: "OrderedDict[tuple, List[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+@functools.cache
+def _is_installed(package: str) -> bool:
+    """Check once per process whether an optional package can be imported"""
+    return importlib.util.find_spec(package) is not None
+
+
+def _get_model(model_name: str):
+    """Return the process-wide SentenceTransformer, loading it on first use"""
+    model = _MODEL_CACHE.get(model_name)
+    if model is None:
+        with _MODEL_LOCK:
+            model = _MODEL_CACHE.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+
+                backend = config.SENTENCE_TRANSFORMER_BACKEND
+                logger.info(
+                    f"Loading sentence transformer model {model_name} ({backend})"
+                )
+                if backend == "torch":
+                    model = _optimize_for_inference(SentenceTransformer(model_name))
+                else:
+                    # ONNX Runtime / OpenVINO export and optimize the graph
+                    # themselves, so the torch-specific tuning doesn't apply
+                    model = SentenceTransformer(model_name, backend=backend)
+                _MODEL_CACHE[model_name] = model
+    return model
+
+
+def _optimize_for_inference(model):
+    """Run the model in fp16 on GPU, or with opt-in int8 dynamic quantization on CPU"""
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return model.to("cuda").half()
+        if config.SENTENCE_TRANSFORMER_QUANTIZE:
+            return torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        return model
+    except Exception as e:
+        logger.warning(f"Could not optimize embedding model, using fp32: {e}")
+        return model
+
+
+def _get_openai_client():
+    """Return the process-wide OpenAI client used for embeddings"""
+    global _openai_client
+    if _openai_client is None:
+        with _MODEL_LOCK:
+            if _openai_client is None:
+                from openai import OpenAI
+
+                _openai_client = OpenAI(
+                    api_key=config.OPENAI_API_KEY,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=OPENAI_MAX_RETRIES,
+                )
+    return _openai_client
+
+
+def _get_async_openai_client():
+    """Return the process-wide AsyncOpenAI client used for embeddings"""
+    global _async_openai_client
+    if _async_openai_client is None:
+        with _MODEL_LOCK:
+            if _async_openai_client is None:
+                from openai import AsyncOpenAI
+
+                _async_openai_client = AsyncOpenAI(
+                    api_key=config.OPENAI_API_KEY,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=OPENAI_MAX_RETRIES,
+                )
+    return _async_openai_client
+
+
+def _openai_chunks(texts: List[str]) -> List[List[str]]:
+    """Split texts into lists small enough for one OpenAI embeddings request"""
+    return [
+        texts[i : i + OPENAI_MAX_BATCH_SIZE]
+        for i in range(0, len(texts), OPENAI_MAX_BATCH_SIZE)
+    ]
+
+
+def warm_up_embedding_model():
+    """Load the configured embedding model so the first request doesn't wait on it"""
+    if config.EMBEDDING_MODEL != config.EmbeddingModel.SENTENCE_TRANSFORMER:
+        return
+    if not _is_installed("sentence_transformers"):
+        logger.warning("SentenceTransformer package not installed, skipping warm-up")
+        return
+    try:
+        _get_model(config.SENTENCE_TRANSFORMER_MODEL)
+    except Exception as e:
+        logger.error(f"Error warming up sentence transformer model: {e}")
+
 
 class EmbeddingGenerator:
     """Generates embeddings for text using configurable backends"""
 
     def __init__(self):
         self.model_type = config.EMBEDDING_MODEL
-        self._openai_client = None
-        self._sentence_transformer = None
 
     def generate(self, text: str) -> List[float]:
         """Generate embedding for the given text using the configured backend"""
+        return self.generate_batch([text])[0]
+
+    def generate_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for several texts with a single backend call"""
+        keys, results, unique_texts = self._lookup_cache(texts)
+        if not unique_texts:
+            return results
+
         if self.model_type == config.EmbeddingModel.OPENAI:
-            return self._generate_openai(text)
+            embeddings = self._generate_openai(list(unique_texts.values()))
         else:
-            return self._generate_sentence_transformer(text)
+            embeddings = self._generate_sentence_transformer(
+                list(unique_texts.values())
+            )
+        return self._fill_results(texts, keys, results, unique_texts, embeddings)
 
-    def _generate_openai(self, text: str) -> List[float]:
-        """Generate embeddings using OpenAI API"""
-        # Import here to avoid immediate dependency on OpenAI
-        try:
-            from openai import OpenAI
+    async def agenerate(self, text: str) -> List[float]:
+        """Generate an embedding without blocking the event loop"""
+        if self.model_type != config.EmbeddingModel.OPENAI:
+            # Local models are CPU bound, so run them in a worker thread
+            return await asyncio.to_thread(self.generate, text)
+        return (await self.agenerate_batch([text]))[0]
 
-            if not self._openai_client:
-                # If API key is not provided, use a fallback method
-                if not config.OPENAI_API_KEY:
-                    logger.warning(
-                        "OpenAI API key not set. Using fallback embedding method."
-                    )
-                    return self._generate_fallback(text)
+    async def agenerate_batch(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of generate_batch using the async OpenAI client"""
+        if self.model_type != config.EmbeddingModel.OPENAI:
+            return await asyncio.to_thread(self.generate_batch, texts)
 
-                self._openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
+        keys, results, unique_texts = self._lookup_cache(texts)
+        if not unique_texts:
+            return results
 
-            response = self._openai_client.embeddings.create(
-                model=config.OPENAI_EMBEDDING_MODEL, input=text
-            )
-            return response.data[0].embedding
+        embeddings = await self._agenerate_openai(list(unique_texts.values()))
+        return self._fill_results(texts, keys, results, unique_texts, embeddings)
+
+    def _lookup_cache(self, texts: List[str]):
+        """Return cache keys, cached results and the distinct texts still missing"""
+        keys = [self._cache_key(text) for text in texts]
+        with _embedding_cache_lock:
+            results = [_embedding_cache.get(key) for key in keys]
+            for key, result in zip(keys, results):
+                if result is not None:
+                    _embedding_cache.move_to_end(key)
+
+        # Embed each distinct text once; duplicates share the result
+        unique_texts = {}
+        for i, result in enumerate(results):
+            if result is None:
+                unique_texts.setdefault(keys[i], texts[i])
+        return keys, results, unique_texts
+
+    def _fill_results(
+        self,
+        texts: List[str],
+        keys: List[tuple],
+        results: List[Optional[List[float]]],
+        unique_texts: Dict[tuple, str],
+        embeddings: Optional[List[List[float]]],
+    ) -> List[List[float]]:
+        """Fill the missing results from a backend call and cache them"""
+        missing = [i for i, result in enumerate(results) if result is None]
+        if embeddings is None:
+            # Fallback vectors are cheap and shouldn't outlive a transient failure
+            for i in missing:
+                results[i] = self._generate_fallback(texts[i])
+            return results
+
+        generated = dict(zip(unique_texts, embeddings))
+        for i in missing:
+            results[i] = generated[keys[i]]
+        with _embedding_cache_lock:
+            _embedding_cache.update(generated)
+            while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                _embedding_cache.popitem(last=False)
+        return results
 
-        except ImportError:
+    def _cache_key(self, text: str) -> tuple:
+        """Key embeddings by backend and a compact digest rather than the full text"""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        return (self.model_type, digest)
+
+    def _openai_available(self) -> bool:
+        """Check that the OpenAI package and API key are both present"""
+        if not _is_installed("openai"):
             logger.warning(
                 "OpenAI package not installed. Using fallback embedding method."
             )
-            return self._generate_fallback(text)
+            return False
+
+        # If API key is not provided, use a fallback method
+        if not config.OPENAI_API_KEY:
+            logger.warning("OpenAI API key not set. Using fallback embedding method.")
+            return False
+        return True
+
+    def _generate_openai(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Generate embeddings using OpenAI API, or None if it is unavailable"""
+        if not self._openai_available():
+            return None
+
+        try:
+            # The embeddings endpoint accepts a list of inputs per request, up
+            # to OPENAI_MAX_BATCH_SIZE of them
+            client = _get_openai_client()
+            return [
+                item.embedding
+                for chunk in _openai_chunks(texts)
+                for item in client.embeddings.create(
+                    model=config.OPENAI_EMBEDDING_MODEL, input=chunk
+                ).data
+            ]
+
         except Exception as e:
             logger.error(f"Error generating OpenAI embedding: {e}")
-            return self._generate_fallback(text)
+            return None
 
-    def _generate_sentence_transformer(self, text: str) -> List[float]:
-        """Generate embeddings using sentence-transformers"""
-        try:
-            if not self._sentence_transformer:
-                try:
-                    from sentence_transformers import SentenceTransformer
+    async def _agenerate_openai(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Generate embeddings with concurrent OpenAI requests, or None on failure"""
+        if not self._openai_available():
+            return None
 
-                    self._sentence_transformer = SentenceTransformer(
-                        config.SENTENCE_TRANSFORMER_MODEL
-                    )
-                except ImportError:
-                    logger.warning(
-                        "SentenceTransformer package not installed. Using fallback method."
+        try:
+            client = _get_async_openai_client()
+            responses = await asyncio.gather(
+                *(
+                    client.embeddings.create(
+                        model=config.OPENAI_EMBEDDING_MODEL, input=chunk
                     )
-                    return self._generate_fallback(text)
+                    for chunk in _openai_chunks(texts)
+                )
+            )
+            return [item.embedding for r in responses for item in r.data]
 
-            # Get embeddings
-            embedding = self._sentence_transformer.encode(text)
-            return embedding.tolist()
+        except Exception as e:
+            logger.error(f"Error generating OpenAI embedding: {e}")
+            return None
+
+    def _generate_sentence_transformer(
+        self, texts: List[str]
+    ) -> Optional[List[List[float]]]:
+        """Generate embeddings using sentence-transformers, or None if unavailable"""
+        if not _is_installed("sentence_transformers"):
+            logger.warning(
+                "SentenceTransformer package not installed. Using fallback method."
+            )
+            return None
+
+        try:
+            model = _get_model(config.SENTENCE_TRANSFORMER_MODEL)
+
+            # Encode in length order to minimise padding, then restore input order
+            order = np.argsort([len(text) for text in texts], kind="stable")
+            embeddings = model.encode(
+                [texts[i] for i in order],
+                batch_size=ENCODE_BATCH_SIZE,
+                show_progress_bar=False,
+            )
+            result = [None] * len(texts)
+            for position, index in enumerate(order):
+                result[index] = embeddings[position].tolist()
+            return result
 
         except Exception as e:
             logger.error(f"Error generating sentence transformer embedding: {e}")
-            return self._generate_fallback(text)
+            return None
 
     def _generate_fallback(self, text: str) -> List[float]:
         """Fallback method when embedding generation fails"""
@@ -84,8 +315,8 @@ class EmbeddingGenerator:
             else config.SENTENCE_TRANSFORMER_DIMENSION
         )
 
-        # Use hash of text to generate pseudo-random but deterministic values
-        seed = sum(ord(c) for c in text)
-        np.random.seed(seed)
-
-        return np.random.rand(dimension).astype(np.float32).tolist()
+        # Expand a hash of the text into pseudo-random but deterministic values in
+        # [0, 1], without touching numpy's global random state
+        raw = hashlib.shake_128(text.encode("utf-8")).digest(dimension * 4)
+        values = np.frombuffer(raw, dtype=np.uint32).astype(np.float32)
+        return (values / np.float32(0xFFFFFFFF)).tolist()
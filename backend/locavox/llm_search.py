@@ -1,18 +1,81 @@
+import hashlib
 import os
+import re
+import time
+from collections import OrderedDict
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 import json
 from . import config
+from .embeddings import EmbeddingGenerator, _is_installed
 from .logger import setup_logger
 from .base_models import Message  # Add this import to fix the NameError
 
 # Set up logger for this module
 logger = setup_logger(__name__)
 
+# Connection pool for the async client, sized so concurrent searches reuse warm
+# TLS connections instead of queueing for a slot or redoing the handshake
+HTTP_POOL_LIMITS = {
+    "max_connections": 1000,
+    "max_keepalive_connections": 100,
+    "keepalive_expiry": 30,
+}
+
+# Coarse topic labels for the keyword pre-classifier. A label applies to a text
+# when at least TOPIC_KEYWORD_MIN_HITS of its keywords appear in it.
+TOPIC_KEYWORDS = {
+    "tasks": frozenset(
+        "task tasks job jobs help need needed service services hire hiring pay "
+        "paid offer offering repair fix install clean cleaning mow lawn garden "
+        "paint painting move moving babysit babysitting tutor tutoring plumber "
+        "electrician handyman delivery errand errands".split()
+    ),
+    "social": frozenset(
+        "event events party meet meetup neighbor neighbors neighbour neighbours "
+        "neighborhood neighbourhood community news discuss discussion chat hello "
+        "welcome festival celebration lost found recommend recommendation "
+        "announcement".split()
+    ),
+}
+TOPIC_KEYWORD_MIN_HITS = 2
+
+# Message content is truncated to this many characters in LLM prompts
+PROMPT_CONTENT_MAX_CHARS = 512
+
+# Output budget for the free-text query insight; generation time grows with it
+INSIGHT_MAX_TOKENS = 150
+
+# Upper bound on topic searches (and so embedding/DB calls) run at once
+MAX_CONCURRENT_TOPIC_SEARCHES = 8
+
+# A topic's best search score outside this band is trusted as its fit to the
+# query; only topics inside it are sent to the LLM for classification
+FIT_SCORE_LOW = 0.3
+FIT_SCORE_HIGH = 0.8
+
+# Same idea for the cosine similarity between the query and a topic's name and
+# description, checked before falling back to the LLM
+TOPIC_SIMILARITY_LOW = 0.2
+TOPIC_SIMILARITY_HIGH = 0.6
+_WORD_PATTERN = re.compile(r"\w+")
+
+# LLM answers are cached per process; similar enough queries reuse a topic fit
+LLM_CACHE_SIZE = 4096
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Rough characters-per-token ratio used to estimate prompt sizes for the TPM limit
+CHARS_PER_TOKEN = 4
+
+# Completion tokens counted against the TPM limit for calls without max_tokens,
+# enough for the JSON replies of the classify and rank prompts
+DEFAULT_COMPLETION_TOKENS = 512
+
 # Don't initialize clients immediately - will be created on-demand if API key is available
 client = None
 async_client = None
+_embedder: Optional[EmbeddingGenerator] = None
 
 
 def get_openai_client():
@@ -43,9 +106,18 @@ def get_async_openai_client():
             logger.warning("OpenAI API key not set. LLM features will be disabled.")
             return None
         try:
+            import httpx
             from openai import AsyncOpenAI
 
-            async_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(**HTTP_POOL_LIMITS),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                # HTTP/2 multiplexes requests over one connection; needs httpx[http2]
+                http2=_is_installed("h2"),
+            )
+            async_client = AsyncOpenAI(
+                api_key=config.OPENAI_API_KEY, http_client=http_client
+            )
         except ImportError:
             logger.error("OpenAI package not installed. LLM features will be disabled.")
             return None
@@ -55,6 +127,186 @@ def get_async_openai_client():
     return async_client
 
 
+async def close_async_openai_client():
+    """Close the shared Async OpenAI client and its connection pool"""
+    global async_client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
+
+
+class TokenBucket:
+    """Async token bucket that refills continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, tokens: float = 1):
+        """Take tokens from the bucket, waiting until the rate allows it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Reserve the tokens up front, so callers wait in arrival order
+        # without needing a lock
+        self.tokens -= min(tokens, self.capacity)
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+_request_bucket: Optional[TokenBucket] = None
+_token_bucket: Optional[TokenBucket] = None
+
+
+async def _create_completion(client, **kwargs):
+    """Create a chat completion within the configured OpenAI RPM/TPM limits"""
+    global _request_bucket, _token_bucket
+    if config.OPENAI_RPM:
+        if _request_bucket is None:
+            _request_bucket = TokenBucket(config.OPENAI_RPM)
+        await _request_bucket.acquire()
+    if config.OPENAI_TPM:
+        if _token_bucket is None:
+            _token_bucket = TokenBucket(config.OPENAI_TPM)
+        prompt_chars = sum(len(m["content"]) for m in kwargs["messages"])
+        await _token_bucket.acquire(
+            prompt_chars / CHARS_PER_TOKEN
+            + kwargs.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+        )
+    return await client.chat.completions.create(**kwargs)
+
+
+def get_embedder() -> EmbeddingGenerator:
+    """Get or create the embedding generator used for queries"""
+    global _embedder
+    if _embedder is None:
+        _embedder = EmbeddingGenerator()
+    return _embedder
+
+
+def classify_topics(text: str) -> set:
+    """Return the coarse topic labels a text matches by keyword hit counts"""
+    words = set(_WORD_PATTERN.findall(text.lower()))
+    return {
+        label
+        for label, keywords in TOPIC_KEYWORDS.items()
+        if len(words & keywords) >= TOPIC_KEYWORD_MIN_HITS
+    }
+
+
+def _format_messages(messages: List[Message]) -> str:
+    """Format up to 10 messages for an LLM prompt (API context window)"""
+    return "\n".join(
+        f"Message {i}:\n"
+        f"Content: {msg.content[:PROMPT_CONTENT_MAX_CHARS]}\n"
+        f"User: {msg.userId}\n"
+        f"Metadata: {msg.metadata_json()}\n"
+        for i, msg in enumerate(messages[:10], start=1)
+    )
+
+
+def _apply_ranking(
+    messages: List[Message], ranking: List[Dict[str, Any]], limit: int
+) -> List[Dict[str, Any]]:
+    """Order messages by an LLM ranking of {"index", "explanation"} items"""
+    explanations = {}
+    for item in ranking:
+        try:
+            idx = int(item["index"]) - 1  # Adjust for 0-indexing
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= idx < len(messages) and idx not in explanations:
+            explanations[idx] = str(item.get("explanation", "")).strip()
+
+    # Add any remaining messages if the ranking didn't cover enough
+    ranked_indices = list(explanations)[:limit]
+    remaining = [i for i in range(len(messages)) if i not in explanations]
+    ranked_indices.extend(remaining[: limit - len(ranked_indices)])
+
+    # Create ranked results with explanations
+    return [
+        {
+            "message": messages[idx],
+            "relevance": 1.0 - (rank / len(ranked_indices)),
+            "explanation": explanations.get(idx, ""),
+        }
+        for rank, idx in enumerate(ranked_indices)
+    ]
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class _TopicFitCache:
+    """LRU cache of topic fits, matched on exact query text or embedding similarity"""
+
+    def __init__(self, maxsize: int, threshold: float):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # (topic name, description) -> query digest -> (unit query vector, fit)
+        self._topics: Dict[tuple, OrderedDict] = {}
+        # Per topic, the digests and their vectors stacked in the same order;
+        # rebuilt after inserts/evictions
+        self._matrices: Dict[tuple, Tuple[List[bytes], np.ndarray]] = {}
+
+    def get(
+        self, topic: tuple, query: str, vector: Optional[np.ndarray]
+    ) -> Optional[Tuple[float, str]]:
+        entries = self._topics.get(topic)
+        if not entries:
+            return None
+
+        digest = _digest(query)
+        if digest not in entries:
+            if vector is None:
+                return None
+            stacked = self._matrices.get(topic)
+            if stacked is None:
+                # Reordering entries on hits doesn't change which rows exist,
+                # so this only needs rebuilding after inserts/evictions
+                keys = list(entries)
+                stacked = self._matrices[topic] = (
+                    keys,
+                    np.stack([entries[key][0] for key in keys]),
+                )
+            keys, matrix = stacked
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            digest = keys[best]
+
+        entries.move_to_end(digest)
+        return entries[digest][1]
+
+    def put(
+        self,
+        topic: tuple,
+        query: str,
+        vector: Optional[np.ndarray],
+        fit: Tuple[float, str],
+    ):
+        if vector is None:
+            return
+        entries = self._topics.setdefault(topic, OrderedDict())
+        digest = _digest(query)
+        entries[digest] = (vector, fit)
+        entries.move_to_end(digest)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        self._matrices.pop(topic, None)
+
+
+_topic_fit_cache = _TopicFitCache(LLM_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+_insight_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+# Unit-length embeddings of (topic name, description); descriptions are static
+_topic_vectors: Dict[Tuple[str, str], np.ndarray] = {}
+
+
 class SmartSearch:
     """Advanced search functionality with LLM-powered capabilities"""
 
@@ -76,23 +328,14 @@ class SmartSearch:
             ]
 
         # Format messages for the LLM
-        formatted_messages = []
-        for i, msg in enumerate(
-            messages[:10]
-        ):  # Limit to 10 messages for API context window
-            formatted_messages.append(
-                f"Message {i + 1}:\n"
-                f"Content: {msg.content}\n"
-                f"User: {msg.userId}\n"
-                f"Metadata: {json.dumps(msg.metadata)}\n"
-            )
-
-        messages_text = "\n".join(formatted_messages)
+        messages_text = _format_messages(messages)
 
         try:
-            completion = await client.chat.completions.create(
+            completion = await _create_completion(
+                client,
                 model="gpt-3.5-turbo",
                 temperature=0.3,
+                response_format={"type": "json_object"},
                 messages=[
                     {
                         "role": "system",
@@ -100,50 +343,16 @@ class SmartSearch:
                     },
                     {
                         "role": "user",
-                        "content": f'Query: "{query}"\n\nMessages to analyze:\n{messages_text}\n\nRank the top {min(limit, len(messages))} messages by relevance to the query. For each message, provide the message number and a brief explanation of its relevance.',
+                        "content": f'Query: "{query}"\n\nMessages to analyze:\n{messages_text}\n\nRank the top {min(limit, len(messages))} messages by relevance to the query. Respond ONLY with JSON: {{"ranking": [{{"index": <message number>, "explanation": <one short sentence>}}]}}, most relevant message first.',
                     },
                 ],
             )
 
-            ranking_explanation = completion.choices[0].message.content
-
-            # Extract ranked message indices from the explanation
-            # This is a simplified implementation - for production, use regex or more robust parsing
-            ranked_indices = []
-            for i in range(1, len(messages) + 1):
-                if f"Message {i}" in ranking_explanation:
-                    ranked_indices.append(i - 1)  # Adjust for 0-indexing
-                    if len(ranked_indices) >= limit:
-                        break
-
-            # Add any remaining messages if we didn't get enough from the parsing
-            remaining = [i for i in range(len(messages)) if i not in ranked_indices]
-            ranked_indices.extend(remaining[: limit - len(ranked_indices)])
-
-            # Create ranked results with explanations
-            ranked_results = []
-            for idx in ranked_indices[:limit]:
-                explanation = ""
-                msg_marker = f"Message {idx + 1}:"
-                if msg_marker in ranking_explanation:
-                    parts = ranking_explanation.split(msg_marker)[1].split("Message")[0]
-                    explanation = parts.strip()
-
-                ranked_results.append(
-                    {
-                        "message": messages[idx],
-                        "relevance": 1.0
-                        - (ranked_indices.index(idx) / len(ranked_indices))
-                        if ranked_indices
-                        else 0,
-                        "explanation": explanation,
-                    }
-                )
-
-            return ranked_results
+            ranking = json.loads(completion.choices[0].message.content)["ranking"]
+            return _apply_ranking(messages, ranking, limit)
 
         except Exception as e:
-            logger.error(f"LLM ranking failed: {e}")
+            logger.error("LLM ranking failed: %s", e)
             # Fall back to simple ranking if LLM fails
             return [
                 {"message": msg, "relevance": 1.0, "explanation": ""}
@@ -161,10 +370,18 @@ class SmartSearch:
             # Return neutral score if LLM is not available
             return (0.5, "LLM unavailable for topic classification")
 
+        topic = (topic_name, topic_description)
+        vector = await SmartSearch._get_cache_vector(query)
+        cached = _topic_fit_cache.get(topic, query, vector)
+        if cached is not None:
+            return cached
+
         try:
-            completion = await client.chat.completions.create(
+            completion = await _create_completion(
+                client,
                 model="gpt-3.5-turbo",
                 temperature=0.2,
+                response_format={"type": "json_object"},
                 messages=[
                     {
                         "role": "system",
@@ -172,54 +389,188 @@ class SmartSearch:
                     },
                     {
                         "role": "user",
-                        "content": f'Topic: {topic_name}\nDescription: {topic_description}\n\nQuery: "{query}"\n\nOn a scale of 0-10, how relevant is this query to the topic? Provide a brief explanation.',
+                        "content": f'Topic: {topic_name}\nDescription: {topic_description}\n\nQuery: "{query}"\n\nHow relevant is this query to the topic? Respond ONLY with JSON: {{"score": <float 0-1>, "explanation": <one short sentence>}}',
                     },
                 ],
             )
 
-            response = completion.choices[0].message.content
+            data = json.loads(completion.choices[0].message.content)
+            fit = (
+                min(max(float(data["score"]), 0), 1),
+                str(data.get("explanation", "")).strip(),
+            )
 
-            # Extract score - basic implementation, could be more robust
-            score = 5.0  # Default middle score
-            try:
-                for line in response.split("\n"):
-                    if any(
-                        x in line.lower()
-                        for x in ["score", "scale", "rating", "relevance"]
-                    ):
-                        # Find the first number in the line
-                        import re
-
-                        numbers = re.findall(r"\d+(?:\.\d+)?", line)
-                        if numbers:
-                            score = float(numbers[0])
-                            if score > 10:  # Handle cases like "8/10"
-                                score = score / 10
-                            break
-            except (ValueError, IndexError) as e:
-                logger.warning(f"Failed to parse score from LLM response: {e}")
-                # Keep default score on parsing error
-
-            # Normalize score to 0-1
-            normalized_score = min(max(score / 10, 0), 1)
-
-            # Extract explanation
-            explanation = response.strip()
-
-            return (normalized_score, explanation)
+            _topic_fit_cache.put(topic, query, vector, fit)
+            return fit
 
         except Exception as e:
             logger.error(f"Topic classification failed: {e}")
             return (0.5, "")  # Return neutral score on error
 
+    @staticmethod
+    async def classify_topic_fit_batch(
+        query: str, topics: List[Tuple[str, str]]
+    ) -> List[Tuple[float, str]]:
+        """Determine how well a query fits several topics with a single LLM call"""
+        if not topics:
+            return []
+
+        # Get the client only when needed
+        client = get_async_openai_client()
+        if client is None:
+            # Return neutral scores if LLM is not available
+            return [(0.5, "LLM unavailable for topic classification")] * len(topics)
+
+        # Only ask the LLM about topics without a cached fit for this query
+        vector = await SmartSearch._get_cache_vector(query)
+        fits = [_topic_fit_cache.get(topic, query, vector) for topic in topics]
+        pending = [i for i, fit in enumerate(fits) if fit is None]
+        if not pending:
+            return fits
+
+        topics_text = "\n".join(
+            f"Topic {n + 1}: {topics[i][0]}\nDescription: {topics[i][1]}"
+            for n, i in enumerate(pending)
+        )
+
+        try:
+            completion = await _create_completion(
+                client,
+                model="gpt-3.5-turbo",
+                temperature=0.2,
+                response_format={"type": "json_object"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an expert at classifying queries into appropriate topics.",
+                    },
+                    {
+                        "role": "user",
+                        "content": f'Query: "{query}"\n\n{topics_text}\n\nHow relevant is this query to each topic? Respond ONLY with JSON: {{"topics": [{{"topic": <topic number>, "score": <float 0-1>, "explanation": <one short sentence>}}]}}',
+                    },
+                ],
+            )
+            entries = json.loads(completion.choices[0].message.content)["topics"]
+        except Exception as e:
+            logger.error(f"Batch topic classification failed: {e}")
+            entries = []  # Neutral scores on error
+
+        for entry in entries:
+            try:
+                index = int(entry["topic"]) - 1
+                score = float(entry["score"])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Failed to parse topic fit from LLM response: {e}")
+                continue
+            if 0 <= index < len(pending):
+                explanation = str(entry.get("explanation", "")).strip()
+                fit = (min(max(score, 0), 1), explanation)
+                fits[pending[index]] = fit
+                _topic_fit_cache.put(topics[pending[index]], query, vector, fit)
+        return [fit if fit is not None else (0.5, "") for fit in fits]
+
+    @staticmethod
+    async def rank_results_with_llm_batch(
+        query: str, result_sets: List[List[Message]], limit: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """Rank and explain the search results of several topics in one LLM call"""
+        if not result_sets:
+            return []
+
+        # Get the async client only when needed
+        client = get_async_openai_client()
+        if client is None:
+            # Fallback to basic ranking if LLM is not available
+            return [
+                [
+                    {"message": msg, "relevance": 1.0, "explanation": ""}
+                    for msg in messages[:limit]
+                ]
+                for messages in result_sets
+            ]
+
+        # Format each topic's messages for the LLM, 10 per topic at most
+        topics_text = "\n".join(
+            f"Topic {t}:\n{_format_messages(messages)}"
+            for t, messages in enumerate(result_sets, start=1)
+        )
+
+        rankings: Dict[int, List[Dict[str, Any]]] = {}
+        try:
+            completion = await _create_completion(
+                client,
+                model="gpt-3.5-turbo",
+                temperature=0.3,
+                response_format={"type": "json_object"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an intelligent search assistant. Analyze messages and rank them based on relevance to the query. Provide a brief explanation for each message's relevance.",
+                    },
+                    {
+                        "role": "user",
+                        "content": f'Query: "{query}"\n\nMessages to analyze, grouped by topic:\n{topics_text}\n\nFor each topic, rank its top {limit} messages by relevance to the query. Respond ONLY with JSON: {{"topics": [{{"topic": <topic number>, "ranking": [{{"index": <message number>, "explanation": <one short sentence>}}]}}]}}, most relevant message first.',
+                    },
+                ],
+            )
+            for entry in json.loads(completion.choices[0].message.content)["topics"]:
+                rankings[int(entry["topic"]) - 1] = entry.get("ranking", [])
+        except Exception as e:
+            logger.error("Batch LLM ranking failed: %s", e)
+            # Fall through: topics without a ranking keep their search order
+
+        return [
+            _apply_ranking(messages, rankings.get(t, []), limit)
+            for t, messages in enumerate(result_sets)
+        ]
+
     @staticmethod
     async def get_query_embeddings(query: str):
         """Get embeddings for the query for semantic search"""
-        # Use the same embedding generator as the storage class for consistency
-        from .embeddings import EmbeddingGenerator
+        # Same backend and embedding cache as the storage class, for consistency
+        return await get_embedder().agenerate(query)
+
+    @staticmethod
+    async def embed_topics(topics: List[Tuple[str, str]]) -> np.ndarray:
+        """Return unit embeddings of (name, description) pairs, one row per topic"""
+        missing = [
+            topic for topic in dict.fromkeys(topics) if topic not in _topic_vectors
+        ]
+        if missing:
+            vectors = await get_embedder().agenerate_batch(
+                [f"{name} {description}" for name, description in missing]
+            )
+            for topic, vector in zip(missing, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                _topic_vectors[topic] = vector / norm if norm else vector
+        return np.vstack([_topic_vectors[topic] for topic in topics])
+
+    @staticmethod
+    async def topic_similarities(
+        query: str, topics: List[Tuple[str, str]]
+    ) -> Optional[np.ndarray]:
+        """Cosine similarity of the query to each topic, or None if unavailable"""
+        if not topics:
+            return np.empty(0, dtype=np.float32)
+        vector = await SmartSearch._get_cache_vector(query)
+        if vector is None:
+            return None
+        return (await SmartSearch.embed_topics(topics)) @ vector
 
-        generator = EmbeddingGenerator()
-        return generator.generate(query)
+    @staticmethod
+    async def _get_cache_vector(query: str) -> Optional[np.ndarray]:
+        """Unit-length query embedding for the semantic cache, or None on failure"""
+        try:
+            # The topic searches just embedded this query, so this is a cache hit
+            vector = np.asarray(
+                await SmartSearch.get_query_embeddings(query), dtype=np.float32
+            )
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            logger.warning(f"Could not embed query for the LLM cache: {e}")
+            return None
 
     @staticmethod
     async def search_all_topics(
@@ -231,60 +582,119 @@ class SmartSearch:
             client = get_async_openai_client()
             use_llm_features = client is not None and config.USE_LLM_BY_DEFAULT
 
-            # Search all topics in parallel
-            search_tasks = []
-            for name, topic in topics.items():
-                search_tasks.append(topic.search_messages(query))
+            # Skip topics whose labels clearly don't fit the query. Topics
+            # without labels are always searched, and if nothing is left the
+            # pre-classification is ignored: it is an optimization, not a gate.
+            query_labels = classify_topics(query)
+            candidates = [
+                name
+                for name, topic in topics.items()
+                if not query_labels or not topic.tags or topic.tags & query_labels
+            ] or list(topics)
+
+            # Embed the query once for every topic search
+            query_embedding = await SmartSearch.get_query_embeddings(query)
+
+            # Search the candidate topics in parallel, a bounded number at a time
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOPIC_SEARCHES)
+
+            async def search_topic(name: str):
+                async with semaphore:
+                    return await topics[name].search_messages_with_scores(
+                        query, query_embedding=query_embedding
+                    )
+
+            search_results = await asyncio.gather(
+                *(search_topic(name) for name in candidates)
+            )
 
-            search_results = await asyncio.gather(*search_tasks)
+            # Only topics with matches take part in classification and ranking
+            matched = []
+            best_scores = []
+            for name, scored in zip(candidates, search_results):
+                if scored:
+                    matched.append((name, [message for message, _ in scored]))
+                    best_scores.append(max(score for _, score in scored))
+
+            # Only call LLM methods if available and enabled. Each is a single
+            # request covering every matched topic rather than one per topic,
+            # and the two are independent so they run concurrently.
+            if use_llm_features and matched:
+                # Clear-cut search scores stand in for the fit; only ambiguous
+                # topics need the LLM to classify them
+                fits = [
+                    (score, "Estimated from search match scores")
+                    for score in best_scores
+                ]
+                ambiguous = [
+                    i
+                    for i, score in enumerate(best_scores)
+                    if FIT_SCORE_LOW <= score <= FIT_SCORE_HIGH
+                ]
+
+                # Then compare the query with the remaining topics' embedded
+                # descriptions; a clear similarity also stands in for the fit
+                similarities = await SmartSearch.topic_similarities(
+                    query,
+                    [
+                        (topics[matched[i][0]].name, topics[matched[i][0]].description)
+                        for i in ambiguous
+                    ],
+                )
+                if similarities is not None:
+                    undecided = []
+                    for i, similarity in zip(ambiguous, similarities.tolist()):
+                        if TOPIC_SIMILARITY_LOW <= similarity <= TOPIC_SIMILARITY_HIGH:
+                            undecided.append(i)
+                        else:
+                            fits[i] = (
+                                min(max(similarity, 0.0), 1.0),
+                                "Estimated from topic description similarity",
+                            )
+                    ambiguous = undecided
+
+                llm_fits, rankings = await asyncio.gather(
+                    SmartSearch.classify_topic_fit_batch(
+                        query,
+                        [
+                            (matched[i][0], topics[matched[i][0]].description)
+                            for i in ambiguous
+                        ],
+                    ),
+                    SmartSearch.rank_results_with_llm_batch(
+                        query, [results for _, results in matched], limit
+                    ),
+                )
+                for i, fit in zip(ambiguous, llm_fits):
+                    fits[i] = fit
+            else:
+                # Basic relevance without LLM
+                fits = [(0.5, "")] * len(matched)
+                rankings = [
+                    [
+                        {"message": msg, "relevance": 1.0, "explanation": ""}
+                        for msg in results[:limit]
+                    ]
+                    for _, results in matched
+                ]
 
             # Combine results with topic information
             topic_results = []
-            topic_names = list(topics.keys())
-
-            for i, (name, results) in enumerate(zip(topic_names, search_results)):
-                if results:
-                    # Get topic description
-                    description = topics[name].description
-
-                    # Initialize with default values
-                    fit_score = 0.5
-                    explanation = ""
-                    ranked_messages = [
-                        {"message": msg, "explanation": ""} for msg in results[:limit]
-                    ]
-
-                    # Only call LLM methods if available and enabled
-                    if use_llm_features:
-                        # Classify topic fit for the query
-                        fit_score, explanation = await SmartSearch.classify_topic_fit(
-                            query, name, description
-                        )
-
-                        # Rank results with LLM
-                        ranked_items = await SmartSearch.rank_results_with_llm(
-                            query, results, min(limit, len(results))
-                        )
-                        ranked_messages = ranked_items
-                    else:
-                        # Basic relevance without LLM
-                        ranked_messages = [
-                            {"message": msg, "relevance": 1.0, "explanation": ""}
-                            for msg in results[:limit]
-                        ]
-
-                    topic_results.append(
-                        {
-                            "topic_name": name,
-                            "topic_description": description,
-                            "relevance_score": fit_score,
-                            "relevance_explanation": explanation,
-                            "messages": [item["message"] for item in ranked_messages],
-                            "explanations": [
-                                item.get("explanation", "") for item in ranked_messages
-                            ],
-                        }
-                    )
+            for (name, _), (fit_score, explanation), ranked_messages in zip(
+                matched, fits, rankings
+            ):
+                topic_results.append(
+                    {
+                        "topic_name": name,
+                        "topic_description": topics[name].description,
+                        "relevance_score": fit_score,
+                        "relevance_explanation": explanation,
+                        "messages": [item["message"] for item in ranked_messages],
+                        "explanations": [
+                            item.get("explanation", "") for item in ranked_messages
+                        ],
+                    }
+                )
 
             # Sort topics by relevance
             topic_results.sort(key=lambda x: x["relevance_score"], reverse=True)
@@ -340,9 +750,17 @@ class SmartSearch:
             for t in topic_results:
                 summary += f"- {t['topic_name']} (Relevance: {t['relevance_score']:.1f}/1.0): {len(t['messages'])} messages\n"
 
-            completion = await client.chat.completions.create(
+            # The summary includes the query, so it identifies the insight
+            key = _digest(summary)
+            if key in _insight_cache:
+                _insight_cache.move_to_end(key)
+                return _insight_cache[key]
+
+            completion = await _create_completion(
+                client,
                 model="gpt-3.5-turbo",
                 temperature=0.7,
+                max_tokens=INSIGHT_MAX_TOKENS,
                 messages=[
                     {
                         "role": "system",
@@ -350,12 +768,16 @@ class SmartSearch:
                     },
                     {
                         "role": "user",
-                        "content": f"{summary}\n\nProvide a brief, helpful insight about these search results. What might the user be looking for and how well do the results match their query?",
+                        "content": f"{summary}\n\nIn two or three sentences, provide a helpful insight about these search results. What might the user be looking for and how well do the results match their query?",
                     },
                 ],
             )
 
-            return completion.choices[0].message.content.strip()
+            insight = completion.choices[0].message.content.strip()
+            _insight_cache[key] = insight
+            while len(_insight_cache) > LLM_CACHE_SIZE:
+                _insight_cache.popitem(last=False)
+            return insight
 
         except Exception as e:
             logger.error(f"Insight generation failed: {e}")
@@ -7,24 +7,21 @@ from typing import Optional
 DEFAULT_LOG_LEVEL = logging.INFO
 DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-# Environment variable to control log level
-LOG_LEVEL_ENV = os.getenv("LOCAVOX_LOG_LEVEL", "").upper()
+# Environment variable to control log level (normalized once at import)
+LOG_LEVEL_ENV = os.getenv("LOCAVOX_LOG_LEVEL", "").strip().upper()
+
+_LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
 
 
 def get_log_level() -> int:
     """Get log level from environment or use default"""
-    if LOG_LEVEL_ENV == "DEBUG":
-        return logging.DEBUG
-    elif LOG_LEVEL_ENV == "INFO":
-        return logging.INFO
-    elif LOG_LEVEL_ENV == "WARNING":
-        return logging.WARNING
-    elif LOG_LEVEL_ENV == "ERROR":
-        return logging.ERROR
-    elif LOG_LEVEL_ENV == "CRITICAL":
-        return logging.CRITICAL
-    else:
-        return DEFAULT_LOG_LEVEL
+    return _LOG_LEVELS.get(LOG_LEVEL_ENV, DEFAULT_LOG_LEVEL)
 
 
 def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
@@ -43,8 +40,11 @@ def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
 
     logger = logging.getLogger(name)
 
-    # Only configure handlers if they haven't been set up already
-    if not logger.handlers:
+    # Only configure a handler if neither this logger nor a parent has one.
+    # Module loggers like "locavox.storage" propagate to the "locavox"
+    # handler, so each line is printed once (a handler on every level printed
+    # it twice), and records still reach any root handlers.
+    if not _has_handler(logger):
         formatter = logging.Formatter(DEFAULT_FORMAT)
         handler = logging.StreamHandler(sys.stdout)
         handler.setFormatter(formatter)
@@ -54,9 +54,14 @@ def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     return logger
 
 
+def _has_handler(logger: logging.Logger) -> bool:
+    """Check whether the logger or a parent below the root has a handler"""
+    while logger is not None and logger is not logging.root:
+        if logger.handlers:
+            return True
+        logger = logger.parent
+    return False
+
+
 # Create the default application logger
 app_logger = setup_logger("locavox")
-
-# Configure root logger for libraries
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.WARNING)  # Set higher threshold for external libraries
@@ -1,16 +1,21 @@
-import os
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional, Sequence, Set, Tuple
+import asyncio
+import heapq
+import itertools
 import uuid
+from collections import defaultdict
 from datetime import datetime
-from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
 from . import config  # Import config first
 from .logger import setup_logger  # Import our centralized logger
 from .config_helpers import get_message_limit  # Import our new helper
+from .db_migrations import ensure_user_id_index
+from .embeddings import EmbeddingGenerator, warm_up_embedding_model
+from .semantic_cache import SemanticCache
 
 # Import models - update to only use BaseTopic
 from .models import (
@@ -23,11 +28,40 @@ from .models import (
 # Set up logger for this module
 logger = setup_logger(__name__)
 
-dot_env_file = os.getenv("LOCAVOX_DOT_ENV_FILE", ".env")
-load_dotenv(dotenv_path=dot_env_file)
-
-# Initialize topics at module level with default topics
-topics = {"marketplace": CommunityTaskMarketplace(), "chat": NeighborhoodHubChat()}
+# Serialize responses with orjson when it is installed
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
+# Default topics at module level; their storage is connected together at
+# startup, or lazily on first use
+topics = {
+    "marketplace": CommunityTaskMarketplace(initialize=False),
+    "chat": NeighborhoodHubChat(initialize=False),
+}
+
+# Per-user message totals across all topics, warmed from storage on first use
+# and kept in step by add_message, so the limit check is a dict lookup
+user_message_counts: Dict[str, int] = defaultdict(int)
+_warmed_users: Set[str] = set()
+_warm_locks: Dict[str, asyncio.Lock] = {}
+
+# The counts only see this process's writes. With several workers, a count
+# this close to the limit is recounted from the latest table versions
+# before another message is accepted.
+USER_COUNT_RECHECK_MARGIN = 10
+
+# Responses to recent queries, per search mode, reused for repeated queries
+# (and paraphrases, for LLM searches) until any topic's data changes
+QUERY_CACHE_SIZE = 10_000
+QUERY_CACHE_THRESHOLD = 0.95
+_query_caches = {
+    use_llm: SemanticCache(QUERY_CACHE_SIZE, QUERY_CACHE_THRESHOLD)
+    for use_llm in (False, True)
+}
+_query_embedder = EmbeddingGenerator()
 
 # Import SmartSearch conditionally - will be done in the query_topics function
 
@@ -39,9 +73,13 @@ async def lifespan(app: FastAPI):
     global topics
     if topics is None:
         topics = {
-            "marketplace": CommunityTaskMarketplace(),
-            "chat": NeighborhoodHubChat(),
+            "marketplace": CommunityTaskMarketplace(initialize=False),
+            "chat": NeighborhoodHubChat(initialize=False),
         }
+    # Index userId before the tables are opened, so per-user reads and counts
+    # start from a version that has the scalar index instead of scanning
+    await ensure_user_id_index()
+    await BaseTopic.bulk_initialize(topics.values())
 
     # Check OpenAI API key status at startup
     if config.OPENAI_API_KEY:
@@ -49,12 +87,37 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("OpenAI API key not set - LLM features will be disabled")
 
+    # Load the embedding model before serving so the first request doesn't block on it
+    warm_up_embedding_model()
+
+    # Embed the topic descriptions used to estimate topic fit in LLM searches
+    if config.OPENAI_API_KEY:
+        try:
+            from .llm_search import SmartSearch
+
+            await SmartSearch.embed_topics(
+                [(topic.name, topic.description) for topic in topics.values()]
+            )
+        except Exception as e:
+            logger.warning(f"Error embedding topic descriptions: {e}")
+
     yield
     # Shutdown
-    # Add any cleanup code here if needed
+    # Release the pooled OpenAI connections if the LLM search was used
+    try:
+        from .llm_search import close_async_openai_client
+
+        await close_async_openai_client()
+    except Exception as e:
+        logger.warning(f"Error closing OpenAI client: {e}")
+
 
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
 
-app = FastAPI(lifespan=lifespan)
+# With gunicorn --preload this runs once in the master before workers fork, so
+# the model weights are shared copy-on-write and the lifespan warm-up is a no-op
+if config.PRELOAD_EMBEDDING_MODEL:
+    warm_up_embedding_model()
 
 # Configure CORS
 app.add_middleware(
@@ -77,100 +140,164 @@ class MessageRequest(BaseModel):
     metadata: Optional[dict] = None
 
 
+def _data_version() -> tuple:
+    """Identify the current topics and the writes made through them"""
+    return BaseTopic.data_version, tuple(id(topic) for topic in topics.values())
+
+
+async def _simple_search(
+    query: str, query_embedding: Optional[Sequence[float]] = None
+) -> dict:
+    """Search all topics without the LLM, answering with the first topic that matches"""
+    # Search the topics concurrently; order still follows the topics dict
+    all_results = await asyncio.gather(
+        *(
+            topic.search_messages(query, 10, query_embedding)
+            for topic in topics.values()
+        )
+    )
+    for topic, relevant_messages in zip(topics.values(), all_results):
+        if relevant_messages:
+            return {
+                "topic": {"name": topic.name, "description": topic.description},
+                "messages": relevant_messages,
+                "query": query,
+            }
+    return {"query": query, "topic": None, "messages": []}
+
+
 @app.post("/query")
 async def query_topics(request: QueryRequest):
     """Enhanced search across topics with LLM-powered ranking and insights"""
     query = request.query
 
     # Use LLM only if explicitly requested and API key is available
-    use_llm = request.use_llm and config.OPENAI_API_KEY
+    use_llm = bool(request.use_llm and config.OPENAI_API_KEY)
+
+    # Serve repeated queries from the cache before embedding anything. Plain
+    # search results depend on the literal text and only embed the query when
+    # text matching finds nothing, so only LLM answers are reused for
+    # paraphrases; either way the response echoes this query
+    query_cache = _query_caches[use_llm]
+    version = _data_version()
+    cached = query_cache.get(query, version)
+    if cached is None and use_llm:
+        # The LLM search embeds the query anyway, and reuses this embedding
+        # from the embedding cache
+        query_embedding = await _query_embedder.agenerate(query)
+        cached = query_cache.get_similar(query_embedding, version)
+    if cached is not None:
+        return {**cached, "query": query}
 
     if not use_llm:
-        # Use search_messages for relevant results without LLM
-        for topic_name, topic in topics.items():
-            # Use each topic's search_messages method to get relevant results
-            relevant_messages = await topic.search_messages(query)
-
-            if relevant_messages:
-                return {
-                    "topic": {"name": topic.name, "description": topic.description},
-                    "messages": relevant_messages,
-                    "query": query,
-                }
-        return {"query": query, "topic": None, "messages": []}
-    else:
-        # Only import SmartSearch when LLM is requested and API key is available
-        try:
-            # Conditional import to avoid initialization issues
-            from .llm_search import SmartSearch
+        results = await _simple_search(query)
+        query_cache.put(query, results, version)
+        return results
 
-            results = await SmartSearch.search_all_topics(query, topics)
-            return results
-        except ImportError as e:
-            logger.error(f"Failed to import SmartSearch module: {e}")
-            # Fall back to simple search on error
-            return await query_topics(QueryRequest(query=query, use_llm=False))
-        except Exception as e:
-            logger.error(f"LLM search failed: {e}")
-            # Fall back to simple search on error
-            return await query_topics(QueryRequest(query=query, use_llm=False))
+    # Only import SmartSearch when LLM is requested and API key is available
+    try:
+        # Conditional import to avoid initialization issues
+        from .llm_search import SmartSearch
+
+        results = await SmartSearch.search_all_topics(query, topics)
+        query_cache.put(query, results, version, query_embedding)
+        return results
+    except ImportError as e:
+        logger.error(f"Failed to import SmartSearch module: {e}")
+        # Fall back to simple search on error
+        return await _simple_search(query, query_embedding)
+    except Exception as e:
+        logger.error(f"LLM search failed: {e}")
+        # Fall back to simple search on error
+        return await _simple_search(query, query_embedding)
 
 
-async def count_user_messages(user_id: str, test_limit: Optional[int] = None) -> int:
-    """Count the total number of messages from a user across all topics"""
-    total_count = 0
-    logger.debug(f"Counting messages for user {user_id}")
+async def count_user_messages(user_id: str, limit: Optional[int] = None) -> int:
+    """Count the total number of messages from a user across all topics
 
-    # Get the current message limit with possible override
-    current_limit = test_limit if test_limit is not None else get_message_limit()
+    limit is the message limit already resolved by the caller, used for logging.
+    """
+    logger.debug("Counting messages for user %s", user_id)
+
+    current_limit = limit if limit is not None else get_message_limit()
+
+    await ensure_user_count_warm(user_id)
+    total_count = user_message_counts[user_id]
+
+    # Messages written by other workers are only seen by counting in storage
+    if total_count + USER_COUNT_RECHECK_MARGIN >= current_limit:
+        total_count, complete = await _count_in_storage(user_id, latest=True)
+        if complete:
+            user_message_counts[user_id] = total_count
+        else:
+            total_count = max(total_count, user_message_counts[user_id])
+
+    # If we've already exceeded the limit, we can return early
+    if total_count >= current_limit:
+        logger.info(
+            "User %s has reached/exceeded the message limit of %s",
+            user_id,
+            current_limit,
+        )
+        return total_count
 
     logger.debug(
-        f"Using message limit: {current_limit} (test override: {test_limit is not None})"
+        "Final count: User %s has a total of %s messages", user_id, total_count
     )
+    return total_count
 
-    # First try with the direct query
-    for topic_name, topic in topics.items():
-        try:
-            # Get messages for this user in this topic
-            user_messages = await topic.get_messages_by_user(user_id, current_limit + 1)
-            topic_count = len(user_messages)
-            logger.debug(
-                f"Found {topic_count} messages in topic {topic_name} for user {user_id}"
-            )
-            total_count += topic_count
-
-            # If we've already exceeded the limit, we can return early
-            if total_count >= current_limit:
-                logger.info(
-                    f"User {user_id} has reached/exceeded the message limit of {current_limit}"
-                )
-                return total_count
-        except Exception as e:
+
+async def ensure_user_count_warm(user_id: str):
+    """Load a user's message count from storage the first time it is needed"""
+    if user_id in _warmed_users:
+        return
+
+    lock = _warm_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        if user_id in _warmed_users:
+            return
+
+        total_count, complete = await _count_in_storage(user_id)
+        user_message_counts[user_id] = total_count
+        if complete:
+            _warmed_users.add(user_id)
+    _warm_locks.pop(user_id, None)
+
+
+async def _count_in_storage(user_id: str, latest: bool = False) -> Tuple[int, bool]:
+    """Count a user's messages in every topic, querying all topics concurrently
+
+    Returns the total and whether every topic could be counted.
+    """
+    topic_names = list(topics)
+    results = await asyncio.gather(
+        *(topic.count_messages_by_user(user_id, latest) for topic in topics.values()),
+        return_exceptions=True,
+    )
+    total_count = 0
+    complete = True
+    for topic_name, topic_count in zip(topic_names, results):
+        if isinstance(topic_count, Exception):
             logger.error(
-                f"Error counting messages for user {user_id} in topic {topic_name}: {e}"
+                f"Error counting messages for user {user_id} in topic {topic_name}: {topic_count}"
             )
-            # Continue with other topics even if one fails
-
-    # Double-check with a full message list if we're getting close to the limit
-    if total_count >= current_limit - 2:
-        # Let's verify the count with a direct API call to be sure
-        manual_count = 0
-        for topic_name, topic in topics.items():
-            try:
-                all_messages = await topic.get_messages(1000)  # Get a larger sample
-                user_messages = [msg for msg in all_messages if msg.userId == user_id]
-                manual_count += len(user_messages)
-
-                if manual_count >= current_limit:
-                    logger.warning(
-                        f"Manual count found that user {user_id} has {manual_count} messages, exceeding limit"
-                    )
-                    return manual_count
-            except Exception as e:
-                logger.error(f"Error in manual count: {e}")
-
-    logger.debug(f"Final count: User {user_id} has a total of {total_count} messages")
-    return total_count
+            # Continue with other topics, but count again next time
+            complete = False
+            continue
+        logger.debug(
+            "Found %s messages in topic %s for user %s",
+            topic_count,
+            topic_name,
+            user_id,
+        )
+        total_count += topic_count
+    return total_count, complete
+
+
+def reset_user_message_counts():
+    """Forget the in-memory counts so they are reloaded from storage"""
+    user_message_counts.clear()
+    _warmed_users.clear()
 
 
 @app.post("/topics/{topic_name}/messages")
@@ -184,24 +311,26 @@ async def add_message(
     """Add a message to a topic with message limit enforcement"""
     user_id = request.userId
     logger.debug(
-        f"Received message request for topic: {topic_name} from user: {user_id}"
+        "Received message request for topic: %s from user: %s", topic_name, user_id
+    )
+
+    # Resolve the limit once per request: test_limit if provided, else config
+    current_limit = test_limit if test_limit is not None else get_message_limit()
+    logger.debug(
+        "Using message limit: %s (test override: %s)",
+        current_limit,
+        test_limit is not None,
     )
 
     # Check if user has reached message limit
     try:
-        # Find out actual message count - pass the test limit
-        user_message_count = await count_user_messages(user_id, test_limit)
-
-        # Use test_limit if provided, otherwise get from config
-        current_limit = test_limit if test_limit is not None else get_message_limit()
-
-        # Add debug logging
-        logger.debug(
-            f"Using message limit: {current_limit} (test override: {test_limit is not None})"
-        )
+        user_message_count = await count_user_messages(user_id, current_limit)
 
         logger.info(
-            f"User {user_id} has {user_message_count} messages (limit: {current_limit})"
+            "User %s has %s messages (limit: %s)",
+            user_id,
+            user_message_count,
+            current_limit,
         )
 
         # Strictly enforce limit
@@ -224,21 +353,27 @@ async def add_message(
 
     # Create topic if it doesn't exist
     if topic_name not in topics:
-        topics[topic_name] = BaseTopic(topic_name)
-        logger.debug(f"Created new topic: {topic_name}")
-
-    # Handle None metadata by defaulting to empty dict
-    metadata = request.metadata if request.metadata is not None else {}
+        topic = topics[topic_name] = BaseTopic(topic_name)
+        logger.debug("Created new topic: %s", topic_name)
+        # An empty table adds nothing to anyone's count, so the cached counts
+        # stay valid; only a table left over from an earlier run needs them
+        # reloaded from storage
+        if topic.storage.table is None or topic.storage.table.count_rows():
+            reset_user_message_counts()
 
     message = Message(
         id=str(uuid.uuid4()),
         content=request.content,
         userId=user_id,
         timestamp=datetime.now(),
-        metadata=metadata,
+        # Handle None metadata by defaulting to empty dict, as it is read back
+        metadata=request.metadata if request.metadata is not None else {},
     )
 
     await topics[topic_name].add_message(message)
+
+    if user_id in _warmed_users:
+        user_message_counts[user_id] += 1
     return message
 
 
@@ -258,7 +393,11 @@ async def list_messages(topic_name: str):
         raise HTTPException(status_code=404, detail="Topic not found")
     # Add await here for the async get_messages call
     messages = await topics[topic_name].get_messages(10)
-    return {"messages": [msg.model_dump() for msg in messages]}
+    # Dump straight to JSON-ready dicts and return the response directly, so
+    # FastAPI doesn't walk the payload again with jsonable_encoder
+    return DefaultResponse(
+        {"messages": [msg.model_dump(mode="json") for msg in messages]}
+    )
 
 
 # Update the endpoint to get messages from a specific user
@@ -267,35 +406,49 @@ async def get_user_messages(
     user_id: str, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=100)
 ):
     """Get all messages from a specific user across all topics using efficient LanceDB filtering"""
-    result = []
-    total_count = 0
+    topic_items = list(topics.items())
+
+    # Each topic only needs to return its newest skip + limit messages; the
+    # totals come from COUNT queries, all run concurrently
+    pages, counts = await asyncio.gather(
+        asyncio.gather(
+            *(
+                topic.get_messages_by_user_sorted(user_id, skip + limit)
+                for _, topic in topic_items
+            ),
+            return_exceptions=True,
+        ),
+        asyncio.gather(
+            *(topic.count_messages_by_user(user_id) for _, topic in topic_items),
+            return_exceptions=True,
+        ),
+    )
 
-    # Use the optimized method for each topic
-    for topic_name, topic in topics.items():
-        # Get messages from this user using the efficient method
-        user_messages = await topic.get_messages_by_user(
-            user_id, 1000
-        )  # Higher limit for aggregation
-        total_count += len(user_messages)
-
-        # Add topic information to each message
-        for msg in user_messages:
-            result.append(
-                {
-                    "message": msg.model_dump(),
-                    "topic": {"name": topic_name, "description": topic.description},
-                }
+    total_count = 0
+    topic_pages = []
+    for (topic_name, topic), page, count in zip(topic_items, pages, counts):
+        if isinstance(page, Exception) or isinstance(count, Exception):
+            logger.error(
+                f"Error getting messages for user {user_id} in topic {topic_name}: "
+                f"{page if isinstance(page, Exception) else count}"
             )
-
-    # Sort messages by timestamp (newest first)
-    result.sort(key=lambda x: x["message"]["timestamp"], reverse=True)
-
-    # Apply pagination
-    paginated_results = result[skip : skip + limit] if skip < len(result) else []
-    return {
-        "user_id": user_id,
-        "total": total_count,
-        "skip": skip,
-        "limit": limit,
-        "messages": paginated_results,
-    }
+            continue
+        total_count += count
+        topic_info = {"name": topic_name, "description": topic.description}
+        topic_pages.append([(msg, topic_info) for msg in page])
+
+    # Merge the already sorted pages (newest first) and cut out the requested page
+    merged = heapq.merge(*topic_pages, key=lambda item: item[0].timestamp, reverse=True)
+    paginated_results = [
+        {"message": msg.model_dump(mode="json"), "topic": topic_info}
+        for msg, topic_info in itertools.islice(merged, skip, skip + limit)
+    ]
+    return DefaultResponse(
+        {
+            "user_id": user_id,
+            "total": total_count,
+            "skip": skip,
+            "limit": limit,
+            "messages": paginated_results,
+        }
+    )
@@ -1,6 +1,6 @@
-from typing import List
-from datetime import datetime
-import uuid
+import asyncio
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Sequence, Set, Tuple
 
 from .base_models import Message
 from .storage import TopicStorage
@@ -9,21 +9,50 @@ from .logger import setup_logger
 # Set up logger for this module
 logger = setup_logger(__name__)
 
+# Most messages written to storage in a single batch
+WRITE_BATCH_SIZE = 256
+
 
 class BaseTopic:
-    def __init__(self, name: str, description: str = None):
+    # Bumped after every write to any topic, so caches of search results can
+    # tell when they are stale without asking each table for its version
+    data_version = 0
+
+    def __init__(self, name: str, description: str = None, initialize: bool = True):
         self.name = name
         # Use provided description or generate a default one
         self.description = description if description else f"Dynamic topic: {name}"
-        self.messages: List[Message] = []
+        # Coarse labels matched against llm_search.classify_topics; untagged
+        # topics are never skipped by the pre-classification
+        self.tags: Set[str] = set()
+        # Messages waiting to be written, with the futures their callers await
+        self._pending_writes: Deque[Tuple[Message, asyncio.Future]] = deque()
+        self._write_task: Optional[asyncio.Task] = None
         self.storage = TopicStorage(name)
-        # Initialize synchronously in constructor for immediate use
-        try:
-            self.storage.initialize_sync()
-        except Exception as e:
-            logger.warning(
-                f"Failed to initialize storage synchronously: {e}, will try async later"
-            )
+        # Initialize synchronously in constructor for immediate use, unless the
+        # caller connects several topics at once with bulk_initialize
+        if initialize:
+            try:
+                self.storage.initialize_sync()
+            except Exception as e:
+                logger.warning(
+                    f"Failed to initialize storage synchronously: {e}, will try async later"
+                )
+
+    @classmethod
+    async def bulk_initialize(cls, topics: Iterable["BaseTopic"]):
+        """Connect the storage of several topics concurrently"""
+        pending = [topic for topic in topics if not topic.storage.table]
+        # Connecting is blocking filesystem work, so overlap it in worker threads
+        results = await asyncio.gather(
+            *(asyncio.to_thread(topic.storage.initialize_sync) for topic in pending),
+            return_exceptions=True,
+        )
+        for topic, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Failed to initialize storage for {topic.name}: {result}, will try again on first use"
+                )
 
     async def initialize(self):
         """Initialize the topic storage"""
@@ -40,33 +69,74 @@ class BaseTopic:
         return self
 
     async def add_message(self, message: Message):
-        """Add a message to this topic"""
-        if not self.storage.table:
-            await self.storage.initialize()
-        await self.storage.add_message(message)
-        self.messages.append(message)
+        """Add a message to this topic, returning once it is stored"""
+        await self._ensure_initialized()
+
+        # Queue the write; messages that arrive while a batch is being written
+        # go out together in the next one
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_writes.append((message, future))
+        if (
+            self._write_task is None
+            or self._write_task.done()
+            or self._write_task.get_loop() is not loop
+        ):
+            self._write_task = loop.create_task(self._flush_writes())
+        await future
         return message
 
-    async def search_messages(self, query: str, limit: int = 10) -> List[Message]:
+    async def _flush_writes(self):
+        """Write queued messages in batches until the queue is empty"""
+        while self._pending_writes:
+            batch = [
+                self._pending_writes.popleft()
+                for _ in range(min(WRITE_BATCH_SIZE, len(self._pending_writes)))
+            ]
+            try:
+                await self.storage.add_messages([message for message, _ in batch])
+            except Exception as e:
+                BaseTopic.data_version += 1  # The batch may be partly written
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                BaseTopic.data_version += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def search_messages(
+        self,
+        query: str,
+        limit: int = 10,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> List[Message]:
         """Search messages in this topic by content"""
-        if not self.storage.table:
-            await self.storage.initialize()
-        return await self.storage.search_messages(query, limit)
+        await self._ensure_initialized()
+        return await self.storage.search_messages(query, limit, query_embedding)
+
+    async def search_messages_with_scores(
+        self,
+        query: str,
+        limit: int = 10,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> List[Tuple[Message, float]]:
+        """Search messages in this topic, returning each with its 0-1 match score"""
+        await self._ensure_initialized()
+        return await self.storage.search_messages_with_scores(
+            query, limit, query_embedding
+        )
 
     async def get_messages(self, limit: int = 100) -> List[Message]:
         """Get all messages from this topic, newest first"""
-        if not self.storage.table:
-            await self.storage.initialize()
+        await self._ensure_initialized()
         return await self.storage.get_messages(limit)
 
     async def _get_table(self):
         """Get the LanceDB table, initializing if needed"""
         try:
-            # Check if the table exists and is initialized
-            if not self.storage.table:
-                await self.storage.initialize()
-
-            if not self.storage.table:
+            if not await self._ensure_initialized():
                 raise ValueError(f"Failed to initialize table for topic {self.name}")
 
             return self.storage.table
@@ -89,74 +159,19 @@ class BaseTopic:
         """
         try:
             # Make sure we're initialized
-            await self._ensure_initialized()
-
-            # If still not initialized, try another approach
-            if not self.storage.table:
+            if not await self._ensure_initialized():
                 logger.warning(f"No table available for topic {self.name}")
                 return []
 
-            logger.debug(f"Querying messages for user {user_id} in topic {self.name}")
-
-            # First try direct query through storage
-            try:
-                messages = await self.storage.get_messages_by_user(user_id, limit)
-                if messages:
-                    logger.debug(f"Found {len(messages)} messages via storage query")
-                    return messages
-            except Exception as e:
-                logger.warning(f"Storage query failed: {e}, trying custom query")
-
-            # Try with Lance where clause
-            try:
-                # Use LanceDB's where clause for efficient filtering
-                # Fix: Use correct case and quoting for field name
-                logger.debug("Trying direct LanceDB where clause")
-                tbl = self.storage.table
-                query = tbl.search().where(f"\"userId\" = '{user_id}'").limit(limit)
-                query_result = await query.execute()
-
-                # Convert results to Message objects
-                messages = []
-                for item in query_result:
-                    try:
-                        # Extract data from the LanceDB result
-                        data = item.to_dict()
-
-                        # Skip malformed entries
-                        if "userId" not in data or "content" not in data:
-                            continue
-
-                        # Create Message object
-                        msg = Message(
-                            id=data.get("id", str(uuid.uuid4())),
-                            userId=data["userId"],
-                            content=data["content"],
-                            timestamp=datetime.fromisoformat(data["timestamp"])
-                            if "timestamp" in data
-                            else datetime.now(),
-                            metadata=data.get("metadata", {}),
-                        )
-                        messages.append(msg)
-                    except (KeyError, ValueError, TypeError) as e:
-                        logger.error(f"Error processing message data: {e}")
-                        # Skip malformed messages
-
-                logger.debug(f"Found {len(messages)} messages via direct where clause")
-                return messages
-
-            except Exception as e:
-                logger.warning(
-                    f"Direct where query failed: {e}, trying final fallback method"
-                )
+            logger.debug(
+                "Querying messages for user %s in topic %s", user_id, self.name
+            )
 
-                # Final fallback: get all messages and filter in memory
-                all_messages = await self.get_messages(1000)  # Get a large sample
-                user_messages = [msg for msg in all_messages if msg.userId == user_id][
-                    :limit
-                ]
-                logger.debug(f"Found {len(user_messages)} messages via full scan")
-                return user_messages
+            # Storage pushes the userId predicate and limit down to the Lance
+            # scan, with its own fallbacks, so only matching rows are read
+            messages = await self.storage.get_messages_by_user(user_id, limit)
+            logger.debug("Found %s messages via storage query", len(messages))
+            return messages
 
         except Exception as e:
             logger.error(
@@ -164,22 +179,48 @@ class BaseTopic:
             )
             return []
 
-    async def _ensure_initialized(self):
-        """Ensure the topic is initialized"""
-        if not self.storage.table:
-            logger.debug(f"Initializing storage for topic {self.name}")
+    async def get_messages_by_user_sorted(
+        self, user_id: str, limit: int = 100, offset: int = 0
+    ) -> List[Message]:
+        """Get a page of a user's messages, newest first"""
+        await self._ensure_initialized()
+        return await self.storage.get_messages_by_user_sorted(user_id, limit, offset)
+
+    async def count_messages_by_user(self, user_id: str, latest: bool = False) -> int:
+        """Count the messages from a specific user in this topic
+
+        latest also counts messages written by other processes since the
+        table was opened.
+        """
+        await self._ensure_initialized()
+        return await self.storage.count_messages_by_user(user_id, latest)
+
+    async def _ensure_initialized(self) -> bool:
+        """Initialize the topic on first use; the single guard every method awaits
+
+        Storage initialization never yields to the event loop, so concurrent
+        callers can't start it twice.
+        """
+        if self.storage.table is None:
+            logger.debug("Initializing storage for topic %s", self.name)
             await self.initialize()
-        return True  # Return success value
+        return self.storage.table is not None
 
 
 # Topic-specific implementations
 class CommunityTaskMarketplace(BaseTopic):
-    def __init__(self):
+    def __init__(self, initialize: bool = True):
         super().__init__(
-            "Community Task Marketplace", "Local tasks and services exchange"
+            "Community Task Marketplace",
+            "Local tasks and services exchange",
+            initialize,
         )
+        self.tags = {"tasks"}
 
 
 class NeighborhoodHubChat(BaseTopic):
-    def __init__(self):
-        super().__init__("Neighborhood Hub Chat", "General neighborhood discussions")
+    def __init__(self, initialize: bool = True):
+        super().__init__(
+            "Neighborhood Hub Chat", "General neighborhood discussions", initialize
+        )
+        self.tags = {"social"}
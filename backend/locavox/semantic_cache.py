@@ -0,0 +1,184 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from .logger import setup_logger
+
+# Set up logger for this module
+logger = setup_logger(__name__)
+
+# SimSIMD's cosine kernels use AVX-512/NEON directly when it is installed
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+# With usearch installed, lookups go through an HNSW index instead of a scan
+try:
+    from usearch.index import Index as HNSWIndex
+except ImportError:
+    HNSWIndex = None
+
+
+def _digest(text: str) -> bytes:
+    """Compact cache key for a query string"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _quantize(vector: Sequence[float]) -> np.ndarray:
+    """int8 copy of an embedding, scaled so its largest component maps to +-127
+
+    Cosine similarity ignores the scale, so it isn't kept.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    scale = np.abs(vector).max(initial=0.0)
+    if not scale:
+        return np.zeros(len(vector), dtype=np.int8)
+    return np.round(vector * (127 / scale)).astype(np.int8)
+
+
+def _norms(vectors: np.ndarray) -> np.ndarray:
+    """L2 norms of int8 vectors, with zeros replaced by 1 to keep divisions finite"""
+    norms = np.linalg.norm(vectors.astype(np.float32), axis=-1)
+    return np.where(norms == 0, 1, norms)
+
+
+class SemanticCache:
+    """LRU cache of responses, matched on exact query text or embedding similarity
+
+    Entries stored without a vector only ever match their exact query text.
+    Every entry belongs to a data version. A lookup or insert under a different
+    version drops the whole cache, so responses never outlive the data they
+    were computed from.
+    """
+
+    def __init__(self, maxsize: int, threshold: float):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # query digest -> (int8 query vector or None, response, index label);
+        # int8 takes a quarter of the memory of float32 and of the bytes per
+        # comparison
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        # Entry vectors stacked in one matrix, rebuilt after inserts/evictions
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_norms: Optional[np.ndarray] = None
+        self._keys: List[bytes] = []
+        # HNSW index over the entry vectors, keyed by label, when usearch is available
+        self._index = None
+        self._labels: Dict[int, bytes] = {}
+        self._next_label = 0
+
+    def get(self, query: str, version: Hashable) -> Optional[Any]:
+        """Return the response cached for exactly this query text"""
+        self._check_version(version)
+        digest = _digest(query)
+        if digest not in self._entries:
+            return None
+        self._entries.move_to_end(digest)
+        return self._entries[digest][1]
+
+    def get_similar(self, vector: Sequence[float], version: Hashable) -> Optional[Any]:
+        """Return the response cached for the most similar query above the threshold"""
+        self._check_version(version)
+        if not self._entries:
+            return None
+
+        digest, similarity = self._nearest(_quantize(vector))
+        if digest is None or not similarity >= self.threshold:  # also rejects NaN
+            return None
+        logger.debug("Semantic cache hit (%.3f)", similarity)
+        self._entries.move_to_end(digest)
+        return self._entries[digest][1]
+
+    def put(
+        self,
+        query: str,
+        response: Any,
+        version: Hashable,
+        vector: Optional[Sequence[float]] = None,
+    ):
+        """Cache the response computed for query under the given data version
+
+        Without a vector the entry is only returned by get for the same text.
+        """
+        self._check_version(version)
+        digest = _digest(query)
+        if digest in self._entries:
+            self._remove(digest)
+
+        label = None
+        if vector is not None:
+            vector = _quantize(vector)
+            label = self._next_label
+            self._next_label += 1
+            if HNSWIndex is not None:
+                if self._index is None:
+                    self._index = HNSWIndex(ndim=len(vector), metric="cos", dtype="i8")
+                self._index.add(label, vector)
+                self._labels[label] = digest
+        self._entries[digest] = (vector, response, label)
+
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+        self._matrix = None
+
+    def clear(self):
+        """Drop every cached response"""
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_norms = None
+        self._keys = []
+        self._index = None
+        self._labels.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, digest: bytes):
+        """Drop one entry, along with its vector in the HNSW index"""
+        _, _, label = self._entries.pop(digest)
+        if self._index is not None and label is not None:
+            self._index.remove(label)
+            del self._labels[label]
+        self._matrix = None
+
+    def _check_version(self, version: Hashable):
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def _nearest(self, vector: np.ndarray):
+        """Digest and cosine similarity of the cached query closest to vector"""
+        if HNSWIndex is not None:
+            if self._index is None:
+                return None, -1.0
+            matches = self._index.search(vector, 1)
+            if not len(matches):
+                return None, -1.0
+            label = int(matches.keys[0])
+            return self._labels[label], 1.0 - float(matches.distances[0])
+
+        if self._matrix is None:
+            # Reordering entries on hits doesn't change which rows exist, so
+            # the matrix only needs rebuilding when entries are added or evicted
+            self._keys = [
+                key for key, entry in self._entries.items() if entry[0] is not None
+            ]
+            if not self._keys:
+                return None, -1.0
+            self._matrix = np.stack([self._entries[key][0] for key in self._keys])
+            self._matrix_norms = _norms(self._matrix)
+        if simsimd is not None:
+            distances = np.asarray(
+                simsimd.cdist(vector[np.newaxis, :], self._matrix, metric="cosine")
+            )[0]
+            best = int(np.argmin(distances))
+            return self._keys[best], 1.0 - float(distances[best])
+        # Accumulate the int8 products in int32 so they can't overflow
+        dots = np.matmul(self._matrix, vector, dtype=np.int32)
+        similarities = dots / (self._matrix_norms * _norms(vector))
+        best = int(np.argmax(similarities))
+        return self._keys[best], float(similarities[best])
@@ -1,20 +1,46 @@
-from typing import Dict, List, Union, Any
+import functools
+from typing import Dict, List, Optional, Sequence, Tuple, Union, Any
 import lancedb
 import os
 import pyarrow as pa
-import json
+import pyarrow.compute as pc
 import numpy as np
-from datetime import datetime
-from .base_models import Message  # Updated import
+from .base_models import Message, dump_metadata, load_metadata
 from . import config
 from .embeddings import EmbeddingGenerator
 from .logger import setup_logger
-import asyncio
-import pathlib
 
 # Set up logger for this module
 logger = setup_logger(__name__)
 
+# Message fields stored alongside the embedding vector
+MESSAGE_COLUMNS = ["id", "content", "userId", "timestamp", "metadata"]
+REQUIRED_MESSAGE_FIELDS = ("id", "content", "userId", "timestamp")
+
+# Rows per record batch when streaming scans that keep only the newest messages
+SCAN_BATCH_SIZE = 1024
+
+# Predicates are rebuilt for the same few active users over and over, so the
+# most recent ones are kept instead of being reallocated on every query
+USER_FILTER_CACHE_SIZE = 1024
+_USER_ID_FIELD = pc.field("userId")
+
+
+@functools.lru_cache(maxsize=USER_FILTER_CACHE_SIZE)
+def user_id_filter(user_id: str) -> str:
+    """Build a SQL predicate matching user_id, with quotes in the value escaped
+
+    LanceDB where clauses don't take bound parameters, so the value is inlined.
+    """
+    escaped = user_id.replace("'", "''")
+    return f"`userId` = '{escaped}'"
+
+
+@functools.lru_cache(maxsize=USER_FILTER_CACHE_SIZE)
+def _user_id_expression(user_id: str) -> pc.Expression:
+    """Filter expression matching user_id, passed to Lance without any SQL"""
+    return _USER_ID_FIELD == user_id
+
 
 class TopicStorage:
     def __init__(self, topic_name: str):
@@ -26,6 +52,7 @@ class TopicStorage:
         self.table_name = "messages"
         self.db = None
         self.table = None
+        self._dataset = None  # Cached Lance dataset handle, see _get_dataset
         self.embedding_generator = EmbeddingGenerator()
         self._initialized = False
 
@@ -44,41 +71,14 @@ class TopicStorage:
                 ("userId", pa.string()),
                 ("timestamp", pa.timestamp("us")),
                 ("metadata", pa.string()),
-                (
-                    "vector",
-                    pa.list_(pa.float32()),
-                ),  # Changed from fixed_size_list to list_
+                # Lance only runs vector search on fixed-size list columns
+                ("vector", pa.list_(pa.float32(), self.vector_dim)),
             ]
         )
         self.similarity_threshold = 0.1  # Vector similarity threshold
         self.text_match_threshold = 0  # Text match threshold
 
-    def _create_empty_table(self):
-        """Create an empty table with the correct schema"""
-        # Create an empty vector with proper dimension
-        empty_vector = [[0.0] * self.vector_dim]  # Single row with zeros
-
-        arrays = [
-            pa.array(["dummy"]),  # id
-            pa.array(["dummy"]),  # content
-            pa.array(["dummy"]),  # userId
-            pa.array([datetime.now()]),  # timestamp
-            pa.array(['{"dummy": true}']),  # metadata
-            pa.array(empty_vector, type=pa.list_(pa.float32())),  # vector
-        ]
-
-        return pa.RecordBatch.from_arrays(arrays, schema=self._schema)
-
-    def _clear_dummy_data(self):
-        """Remove the dummy record used for initialization"""
-        if self.table:
-            # Delete where id='dummy'
-            try:
-                self.table.delete('id = "dummy"')
-            except Exception as e:
-                logger.warning(f"Could not delete dummy data: {e}")
-
-    async def _create_or_connect_db(self):
+    def _create_or_connect_db(self):
         """Create or connect to the database"""
         try:
             # Ensure the directory exists
@@ -91,29 +91,25 @@ class TopicStorage:
             logger.error(f"Error connecting to database: {e}")
             raise
 
-    async def _create_or_connect_table(self):
+    def _create_or_connect_table(self):
         """Create or connect to the table"""
         try:
             # First make sure we have a database
             if not self.db:
-                self.db = await self._create_or_connect_db()
+                self.db = self._create_or_connect_db()
 
-            # Check if table exists
-            table_path = os.path.join(self.db_path, self.table_name + ".lance")
+            self._dataset = None
 
-            if pathlib.Path(table_path).exists():
+            try:
                 # Table exists, connect to it
                 self.table = self.db.open_table(self.table_name)
-                logger.debug(f"Connected to existing table {self.table_name}")
-            else:
-                # Table doesn't exist, create it
-                empty_batch = self._create_empty_table()
+                logger.debug("Connected to existing table %s", self.table_name)
+            except (FileNotFoundError, ValueError):
+                # Table doesn't exist, create it empty from the schema
                 self.table = self.db.create_table(
-                    self.table_name, data=empty_batch, mode="create"
+                    self.table_name, schema=self._schema, mode="create"
                 )
-                logger.debug(f"Created new table {self.table_name}")
-                # Clear the dummy data
-                self._clear_dummy_data()
+                logger.debug("Created new table %s", self.table_name)
 
             return self.table
         except Exception as e:
@@ -122,10 +118,18 @@ class TopicStorage:
 
     async def initialize(self):
         """Initialize the storage for the topic"""
+        return self.initialize_sync()
+
+    def initialize_sync(self):
+        """Connect to the database and table without needing an event loop
+
+        LanceDB's connect/open calls are synchronous, so there is no loop to
+        probe or create here, whether or not one is already running.
+        """
         try:
             # Connect to the database and table
-            await self._create_or_connect_db()
-            await self._create_or_connect_table()
+            self._create_or_connect_db()
+            self._create_or_connect_table()
 
             self._initialized = True
             return self
@@ -135,34 +139,6 @@ class TopicStorage:
             self._initialized = False
             raise
 
-    def initialize_sync(self):
-        """Synchronous wrapper for initialize"""
-        try:
-            # Create the event loop or use existing one
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-
-            # Run the async initialization function
-            if loop.is_running():
-                # We're in an async context, create a task
-                future = asyncio.ensure_future(self.initialize())
-                # We can't await, so we'll have to rely on the task completing later
-                # This is not ideal but sometimes necessary
-                logger.warning(
-                    "initialize_sync called in async context - initialization may not be complete"
-                )
-            else:
-                # We can run the loop to completion
-                loop.run_until_complete(self.initialize())
-
-            return self
-        except Exception as e:
-            logger.error(f"Error in initialize_sync: {e}")
-            self._initialized = False
-            raise
-
     async def _ensure_initialized(self):
         """Ensure the storage is initialized"""
         if not self._initialized or not self.table:
@@ -171,81 +147,105 @@ class TopicStorage:
 
     async def add_message(self, message: Union[Dict, Message]):
         """Add a message to the storage"""
+        await self.add_messages([message])
+
+    async def add_messages(self, messages: Sequence[Union[Dict, Message]]):
+        """Add several messages to the storage as a single Lance write"""
         # Make sure we're initialized
         await self._ensure_initialized()
 
-        message_dict = (
+        message_dicts = [
             message.model_dump() if isinstance(message, Message) else message.copy()
-        )
+            for message in messages
+        ]
 
-        # Ensure vector is a list of float32
-        vector = np.array(
-            self.embedding_generator.generate(message_dict["content"]), dtype=np.float32
+        # Embed the whole batch at once, as float32
+        vectors = np.array(
+            await self.embedding_generator.agenerate_batch(
+                [message_dict["content"] for message_dict in message_dicts]
+            ),
+            dtype=np.float32,
         )
 
         # Ensure vector dimension is correct
-        if len(vector) != self.vector_dim:
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_dim:
             raise ValueError(
-                f"Vector dimension mismatch. Expected {self.vector_dim}, got {len(vector)}"
+                f"Vector dimension mismatch. Expected {self.vector_dim}, got {vectors.shape[-1]}"
             )
 
-        # Convert single values to arrays for PyArrow
+        # One column per field, one entry per message
         prepared_data = {
-            "id": [message_dict["id"]],  # Wrap in list
-            "content": [message_dict["content"]],  # Wrap in list
-            "userId": [message_dict["userId"]],  # Wrap in list
-            "timestamp": [message_dict["timestamp"]],  # Wrap in list
-            "metadata": [json.dumps(message_dict.get("metadata", {}))],  # Wrap in list
-            "vector": [vector.tolist()],  # Wrap in list
+            "id": [m["id"] for m in message_dicts],
+            "content": [m["content"] for m in message_dicts],
+            "userId": [m["userId"] for m in message_dicts],
+            "timestamp": [m["timestamp"] for m in message_dicts],
+            "metadata": [dump_metadata(m.get("metadata")) for m in message_dicts],
+            "vector": vectors.tolist(),
         }
 
-        # Create PyArrow record batch with schema
+        # Create PyArrow record batch with schema; each add commits a new
+        # table version, so batching also keeps the fragment count down
         try:
-            batch = pa.RecordBatch.from_pydict(prepared_data, schema=self._schema)
+            # Follow the table's own schema, since tables created before the
+            # vector column was fixed-size still store variable-length lists
+            batch = pa.RecordBatch.from_pydict(prepared_data, schema=self.table.schema)
             self.table.add(batch)
         except Exception as e:
             logger.error(f"Error adding message to storage: {e}")
             raise
 
-    async def search_messages(self, query: str, limit: int = 10) -> List[Message]:
+    async def search_messages(
+        self,
+        query: str,
+        limit: int = 10,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> List[Message]:
         """Search for messages matching the query"""
+        results = await self.search_messages_with_scores(query, limit, query_embedding)
+        return [message for message, _ in results]
+
+    async def search_messages_with_scores(
+        self,
+        query: str,
+        limit: int = 10,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> List[Tuple[Message, float]]:
+        """Search for messages matching the query, with their 0-1 match scores
+
+        Pass query_embedding when it is already known, e.g. when the same
+        query is searched in several topics, to skip embedding it again.
+        """
         # Make sure we're initialized
         await self._ensure_initialized()
 
         try:
-            # Try to get pandas DataFrame from table - handle empty tables
+            # Read the messages without their vectors; the scoring below runs
+            # on the Arrow columns, so nothing is kept between queries
             try:
-                df = self.table.to_pandas()
-                if df.empty:
+                table = self._get_dataset().to_table(columns=MESSAGE_COLUMNS)
+                if table.num_rows == 0:
                     return []
             except Exception as e:
-                logger.warning(f"Error fetching data as pandas DataFrame: {e}")
+                logger.warning(f"Error fetching messages for search: {e}")
                 return []
 
             # Calculate text search scores
-            df["text_score"] = df["content"].apply(
-                lambda x: self._text_search_score(x, query)
+            query_lower = query.lower()
+            text_scores = self._text_search_scores(
+                pc.utf8_lower(table["content"]), query_lower, query_lower.split()
             )
 
-            # Get exact matches first
-            exact_matches = df[df["text_score"] > 0.8]
-            if not exact_matches.empty:
-                messages = []
-                for _, row in exact_matches.head(limit).iterrows():
-                    data = row.to_dict()
-                    try:
-                        data["metadata"] = json.loads(data["metadata"])
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse message metadata: {e}")
-                        data["metadata"] = {}
-                    data["embedding"] = data.pop("vector")
-                    messages.append(Message(**data))
-                return messages
+            # Get exact matches first, in table order
+            exact = np.flatnonzero(text_scores > 0.8)[:limit]
+            if len(exact):
+                return self._table_to_scored_messages(
+                    table.take(exact), text_scores[exact]
+                )
 
             # If no exact matches, try vector search
-            query_vector = np.array(
-                self.embedding_generator.generate(query), dtype=np.float32
-            ).tolist()
+            if query_embedding is None:
+                query_embedding = await self.embedding_generator.agenerate(query)
+            query_vector = np.array(query_embedding, dtype=np.float32).tolist()
 
             # Try vector search but handle errors
             try:
@@ -253,32 +253,37 @@ class TopicStorage:
                     self.table.search(query_vector)
                     .metric("cosine")
                     .nprobes(10)
-                    .limit(len(df))
-                    .to_pandas()
+                    .select(["id"])
+                    .limit(table.num_rows)
+                    .to_arrow()
                 )
             except Exception as e:
                 logger.warning(f"Vector search failed: {e}")
                 return []
 
-            if not vector_results.empty:
-                df["vector_score"] = 1 - vector_results["_distance"]
-                df["final_score"] = df["text_score"] * 0.7 + df["vector_score"] * 0.3
-
-                # Filter and sort results
-                df = df[df["final_score"] >= self.similarity_threshold]
-                df = df.sort_values("final_score", ascending=False)
-
-                messages = []
-                for _, row in df.head(limit).iterrows():
-                    data = row.to_dict()
-                    try:
-                        data["metadata"] = json.loads(data["metadata"])
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse message metadata: {e}")
-                        data["metadata"] = {}
-                    data["embedding"] = data.pop("vector")
-                    messages.append(Message(**data))
-                return messages
+            if vector_results.num_rows:
+                # Vector results come back in distance order, so line them up
+                # with the table rows by message id
+                positions = pc.index_in(table["id"], value_set=vector_results["id"])
+                vector_scores = (
+                    pc.subtract(1, pc.take(vector_results["_distance"], positions))
+                    .fill_null(0.0)
+                    .to_numpy(zero_copy_only=False)
+                )
+                final_scores = text_scores * 0.7 + vector_scores * 0.3
+
+                # Filter, then select the top results without sorting every row
+                candidates = np.flatnonzero(final_scores >= self.similarity_threshold)
+                if len(candidates) > limit:
+                    top = np.argpartition(-final_scores[candidates], limit - 1)[:limit]
+                    candidates = candidates[top]
+                # Highest score first, ties in table order
+                candidates = candidates[
+                    np.lexsort((candidates, -final_scores[candidates]))
+                ]
+                return self._table_to_scored_messages(
+                    table.take(candidates), final_scores[candidates]
+                )
 
             return []
         except Exception as e:
@@ -291,50 +296,8 @@ class TopicStorage:
         await self._ensure_initialized()
 
         try:
-            # Try different approaches to fetch data, handling potential errors
-            try:
-                # First try to get data as pandas DataFrame
-                df = (
-                    self.table.to_pandas()
-                    .sort_values("timestamp", ascending=False)
-                    .head(limit)
-                )
-                results = df.to_dict("records")
-            except Exception as e:
-                logger.warning(
-                    f"Error fetching data as pandas DataFrame: {e}, trying arrow method"
-                )
-
-                # Try alternate method with arrow
-                try:
-                    # Use LanceDB's arrow interface directly
-                    query_result = (
-                        await self.table.query()
-                        .limit(limit)
-                        .sort_by("timestamp", ascending=False)
-                        .to_arrow()
-                    )
-                    results = [row._asdict() for row in query_result.to_pylist()]
-                except Exception as e2:
-                    logger.error(f"Error fetching data with arrow: {e2}")
-                    return []
-
-            # Convert string metadata back to dict
-            messages = []
-            for result in results:
-                try:
-                    if result["metadata"]:
-                        try:
-                            result["metadata"] = json.loads(result["metadata"])
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse message metadata: {e}")
-                            result["metadata"] = {}
-                    messages.append(Message(**result))
-                except Exception as e:
-                    logger.warning(f"Error processing message data: {e}")
-                    # Skip malformed messages
-
-            return messages
+            # Only the requested rows are converted to Python objects
+            return self._table_to_messages(self._scan_newest(limit))
         except Exception as e:
             logger.error(f"Error getting messages: {e}")
             return []
@@ -348,110 +311,177 @@ class TopicStorage:
 
         try:
             logger.debug(
-                f"Getting messages for user {user_id} in topic {self.topic_name}"
+                "Getting messages for user %s in topic %s", user_id, self.topic_name
             )
 
-            # Try method 1: Using search with where clause
+            # Try method 1: scan the cached dataset handle, so repeated queries
+            # don't reopen the table; Lance applies the filter and limit
             try:
-                # Fix: Use exact field name "userId" (case sensitive)
-                query = (
-                    self.table.search().where(f"\"userId\" = '{user_id}'").limit(limit)
+                table = self._get_dataset().to_table(
+                    columns=MESSAGE_COLUMNS,
+                    filter=_user_id_expression(user_id),
+                    limit=limit,
                 )
-                result_df = query.to_pandas()
-
-                if result_df.empty:
-                    logger.debug(
-                        f"No messages found for user {user_id} in {self.topic_name}"
-                    )
-                    return []
-
-                messages = []
-                for _, row in result_df.iterrows():
-                    try:
-                        data = row.to_dict()
-                        if data["metadata"]:
-                            try:
-                                data["metadata"] = json.loads(data["metadata"])
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to parse message metadata: {e}")
-                                data["metadata"] = {}
-                        messages.append(Message(**data))
-                    except Exception as e:
-                        logger.warning(f"Error processing message data: {e}")
-                        # Skip malformed messages
-
-                logger.debug(f"Found {len(messages)} messages for user {user_id}")
+                messages = self._table_to_messages(table)
+                logger.debug("Found %s messages for user %s", len(messages), user_id)
                 return messages
 
             except Exception as e:
                 logger.warning(f"Method 1 failed: {e}, trying method 2")
 
-                # Try method 2 with alternative syntax
-                try:
-                    # Use different syntax with double quotes for field name
-                    query = (
-                        self.table.search()
-                        .where('userId = "{}"'.format(user_id))
-                        .limit(limit)
-                    )
-                    result_df = query.to_pandas()
-
-                    if not result_df.empty:
-                        messages = []
-                        for _, row in result_df.iterrows():
-                            try:
-                                data = row.to_dict()
-                                if data["metadata"]:
-                                    data["metadata"] = json.loads(data["metadata"])
-                                messages.append(Message(**data))
-                            except Exception as e:
-                                logger.warning(f"Error processing message: {e}")
-
-                        logger.debug(f"Method 2 found {len(messages)} messages")
-                        return messages
-                except Exception as e2:
-                    logger.warning(
-                        f"Method 2 also failed: {e2}, falling back to full scan"
-                    )
-
-                # Method 3: Get all messages and filter in Python
-                all_messages = await self.get_messages(
-                    1000
-                )  # Increased limit for filtering
-                user_messages = [msg for msg in all_messages if msg.userId == user_id][
-                    :limit
-                ]
-
-                logger.debug(
-                    f"Method 3: Found {len(user_messages)} messages for user {user_id}"
+                # Method 2: go through the LanceDB query builder with a where clause.
+                # Backticks keep the mixed-case column name; Lance reads a
+                # double-quoted "userId" as a string literal and matches nothing
+                query = (
+                    self.table.search()
+                    .where(user_id_filter(user_id))
+                    .select(MESSAGE_COLUMNS)
+                    .limit(limit)
                 )
-                return user_messages
+                messages = self._table_to_messages(query.to_arrow())
+                logger.debug("Method 2 found %s messages", len(messages))
+                return messages
 
         except Exception as e:
             logger.error(f"Failed to get messages for user {user_id}: {e}")
             return []
 
-    def _text_search_score(self, content: str, query: str) -> float:
-        """Calculate text match score with exact and partial matching"""
+    async def count_messages_by_user(self, user_id: str, latest: bool = False) -> int:
+        """Count a user's messages without reading the rows
+
+        With latest, the table first moves to its newest version, picking up
+        writes made through other connections such as other worker processes.
+        """
+        # Make sure we're initialized
+        await self._ensure_initialized()
+
+        if latest:
+            self.table.checkout_latest()
+        return self._get_dataset().count_rows(filter=_user_id_expression(user_id))
+
+    async def get_messages_by_user_sorted(
+        self, user_id: str, limit: int = 100, offset: int = 0
+    ) -> List[Message]:
+        """Get a user's messages newest first, materializing only the requested page"""
+        # Make sure we're initialized
+        await self._ensure_initialized()
+
+        # Lance applies the userId filter during the scan; only the rows
+        # returned become Message objects
+        table = self._scan_newest(offset + limit, _user_id_expression(user_id))
+        return self._table_to_messages(table.slice(offset))
+
+    def _scan_newest(
+        self, limit: int, filter: Optional[pc.Expression] = None
+    ) -> pa.Table:
+        """Stream the table and keep its newest `limit` rows matching filter
+
+        The scan has no ORDER BY, so the running top-k is merged with each
+        record batch; memory stays at about limit + SCAN_BATCH_SIZE rows.
+        """
+        newest = None
+        for batch in self._get_dataset().to_batches(
+            columns=MESSAGE_COLUMNS, filter=filter, batch_size=SCAN_BATCH_SIZE
+        ):
+            table = pa.Table.from_batches([batch])
+            if newest is not None:
+                table = pa.concat_tables([newest, table])
+            newest = table.take(
+                pc.select_k_unstable(
+                    table, limit, sort_keys=[("timestamp", "descending")]
+                )
+            )
+        if newest is None:
+            schema = self._get_dataset().schema
+            return pa.schema([schema.field(c) for c in MESSAGE_COLUMNS]).empty_table()
+        return newest
+
+    def _get_dataset(self):
+        """Return the Lance dataset behind the table, reopening it only after writes"""
+        version = self.table.version
+        if self._dataset is None or self._dataset.version != version:
+            self._dataset = self.table.to_lance()
+        return self._dataset
+
+    def _table_to_scored_messages(
+        self, table: pa.Table, scores: np.ndarray
+    ) -> List[Tuple[Message, float]]:
+        """Convert scored messages to (Message, score) pairs"""
+        scores = dict(zip(table["id"].to_pylist(), scores.tolist()))
+        # Pair by id since malformed rows are dropped during conversion
+        return [
+            (message, scores[message.id]) for message in self._table_to_messages(table)
+        ]
+
+    def _table_to_messages(self, table: pa.Table) -> List[Message]:
+        """Convert an Arrow table of messages column by column, skipping malformed rows"""
+        valid = None
+        for field in REQUIRED_MESSAGE_FIELDS:
+            if table[field].null_count:
+                mask = pc.is_valid(table[field])
+                valid = mask if valid is None else pc.and_(valid, mask)
+        if valid is not None:
+            table = table.filter(valid)
+            logger.warning(
+                f"Skipping {len(valid) - len(table)} messages with missing fields"
+            )
+
+        # One to_pylist per column instead of a dict per row; the schema fixes
+        # the column types, so the models are built without re-validation
+        return [
+            Message.model_construct(
+                id=message_id,
+                content=content,
+                userId=user_id,
+                timestamp=timestamp,
+                metadata=self._parse_metadata(metadata),
+            )
+            for message_id, content, user_id, timestamp, metadata in zip(
+                *(table[column].to_pylist() for column in MESSAGE_COLUMNS)
+            )
+        ]
+
+    def _parse_metadata(self, metadata: Any) -> Optional[Dict[str, Any]]:
+        """Parse a stored metadata column value, falling back to {} if it is corrupt"""
+        if not isinstance(metadata, str):
+            return metadata
         try:
-            content_lower = content.lower()
-            query_lower = query.lower()
-            query_words = query_lower.split()
-
-            # Exact phrase match gets highest score
-            if query_lower in content_lower:
-                position = content_lower.index(query_lower)
-                # Higher score if match is at start of content
-                return 1.0 if position == 0 else 0.9
-
-            # For single-word queries, be more strict
-            if len(query_words) == 1:
-                return 1.0 if query_lower in content_lower.split() else 0.0
-
-            # For multi-word queries, check word overlap
-            content_words = content_lower.split()
-            matches = sum(1 for word in query_words if word in content_words)
-            return matches / len(query_words) if matches > 0 else 0.0
-        except Exception as e:
-            logger.warning(f"Error calculating text search score: {e}")
-            return 0.0
+            return load_metadata(metadata)
+        except ValueError as e:
+            logger.warning(f"Failed to parse message metadata: {e}")
+            return {}
+
+    def _text_search_scores(
+        self,
+        contents_lower: pa.ChunkedArray,
+        query_lower: str,
+        query_words: List[str],
+    ) -> np.ndarray:
+        """Calculate text match scores for all messages with exact and partial matching"""
+        phrase = (
+            pc.match_substring(contents_lower, query_lower)
+            .fill_null(False)
+            .to_numpy(zero_copy_only=False)
+        )
+        at_start = (
+            pc.starts_with(contents_lower, query_lower)
+            .fill_null(False)
+            .to_numpy(zero_copy_only=False)
+        )
+        # Exact phrase match gets highest score, higher if at start of content
+        scores = np.where(at_start, 1.0, np.where(phrase, 0.9, 0.0))
+
+        # A single word that isn't a substring can't be one of the words either,
+        # so only multi-word queries need the word overlap check
+        if len(query_words) > 1:
+            words = pc.utf8_split_whitespace(contents_lower).combine_chunks()
+            flat_words = pc.list_flatten(words)
+            word_rows = pc.list_parent_indices(words)
+            matches = np.zeros(len(scores))
+            for word in set(query_words):
+                rows = pc.filter(word_rows, pc.equal(flat_words, word))
+                found = np.zeros(len(scores), dtype=bool)
+                found[rows.to_numpy(zero_copy_only=False)] = True
+                matches += found * query_words.count(word)
+            scores = np.where(phrase, scores, matches / len(query_words))
+        return scores
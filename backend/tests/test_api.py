@@ -63,6 +63,24 @@ def test_add_and_list_messages():
     )
 
 
+def test_message_without_metadata_round_trips():
+    topic_name = "no_metadata_topic"
+    response = client.post(
+        f"/topics/{topic_name}/messages",
+        json={"userId": "test_user", "content": "No metadata here"},
+    )
+    assert response.status_code == 200
+    created = response.json()
+
+    response = client.get(f"/topics/{topic_name}/messages")
+    assert response.status_code == 200
+    listed = response.json()["messages"][0]
+
+    # Both responses return the same empty metadata record
+    assert created["metadata"] == {}
+    assert listed["metadata"] == created["metadata"]
+
+
 def test_query_topics(mock_embedding_generator):
     """Test querying topics with the embedding generator mocked"""
     # Add messages to different topics
@@ -92,6 +110,34 @@ def test_query_topics(mock_embedding_generator):
         )
 
 
+def test_plain_query_embeds_only_for_vector_search():
+    """Plain queries don't embed up front, and exact repeats don't embed at all"""
+    from locavox.main import _query_embedder
+
+    client.post(
+        "/topics/embedding_topic/messages",
+        json={"userId": "test_user", "content": "Bike repair wanted"},
+    )
+
+    with (
+        patch.object(_query_embedder, "agenerate") as agenerate,
+        patch("locavox.storage.EmbeddingGenerator.agenerate") as storage_agenerate,
+    ):
+        embedding_calls = []
+        for _ in range(2):  # A cache miss, then an exact cache hit
+            response = client.post(
+                "/query", json={"query": "bike repair", "use_llm": False}
+            )
+            assert response.status_code == 200
+            assert response.json()["query"] == "bike repair"
+            assert response.json()["messages"][0]["content"] == "Bike repair wanted"
+            embedding_calls.append(storage_agenerate.call_count)
+
+    # Only topics without a text match embed the query, and only on the miss
+    agenerate.assert_not_called()
+    assert embedding_calls[0] == embedding_calls[1]
+
+
 def test_query_topics_with_llm(mock_openai):
     """Test querying topics with LLM enabled"""
     # Add a test message
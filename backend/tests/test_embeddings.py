@@ -0,0 +1,130 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from locavox import config, embeddings
+from locavox.embeddings import OPENAI_MAX_BATCH_SIZE, EmbeddingGenerator
+
+
+@pytest.fixture(autouse=True)
+def empty_embedding_cache():
+    """Start every test without cached embeddings"""
+    embeddings._embedding_cache.clear()
+    yield
+    embeddings._embedding_cache.clear()
+
+
+def fake_openai_response(input):
+    """Embeddings response with one vector per input, derived from the text"""
+    return MagicMock(data=[MagicMock(embedding=[float(len(text))]) for text in input])
+
+
+@pytest.fixture
+def openai_generator(monkeypatch):
+    """EmbeddingGenerator on the OpenAI backend, with mocked sync and async clients"""
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "test-key", raising=False)
+    client = MagicMock()
+    client.embeddings.create.side_effect = lambda model, input: fake_openai_response(
+        input
+    )
+    async_client = MagicMock()
+    async_client.embeddings.create = AsyncMock(
+        side_effect=lambda model, input: fake_openai_response(input)
+    )
+
+    generator = EmbeddingGenerator()
+    generator.model_type = config.EmbeddingModel.OPENAI
+    with (
+        patch.object(embeddings, "_is_installed", return_value=True),
+        patch.object(embeddings, "_get_openai_client", return_value=client),
+        patch.object(embeddings, "_get_async_openai_client", return_value=async_client),
+    ):
+        yield generator, client, async_client
+
+
+@pytest.mark.asyncio
+async def test_openai_batches_are_split_into_requests(openai_generator):
+    generator, client, async_client = openai_generator
+    texts = [f"text {i}" for i in range(OPENAI_MAX_BATCH_SIZE + 10)]
+
+    # The sync and async paths both stay within the per-request input limit
+    results = generator.generate_batch(texts)
+    calls = client.embeddings.create.call_args_list
+    assert [len(call.kwargs["input"]) for call in calls] == [OPENAI_MAX_BATCH_SIZE, 10]
+    assert results == [[float(len(text))] for text in texts]
+
+    embeddings._embedding_cache.clear()
+    results = await generator.agenerate_batch(texts)
+    assert async_client.embeddings.create.await_count == 2
+    assert results == [[float(len(text))] for text in texts]
+
+
+class FakeModel:
+    """Sentence transformer stand-in that records the texts it encodes"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.append(list(texts))
+        return np.array([[float(len(text)), float(ord(text[0]))] for text in texts])
+
+
+@pytest.fixture
+def local_generator():
+    """EmbeddingGenerator on the sentence transformer backend with a fake model"""
+    model = FakeModel()
+    generator = EmbeddingGenerator()
+    generator.model_type = config.EmbeddingModel.SENTENCE_TRANSFORMER
+    with (
+        patch.object(embeddings, "_is_installed", return_value=True),
+        patch.object(embeddings, "_get_model", return_value=model),
+    ):
+        yield generator, model
+
+
+def expected(text):
+    return [float(len(text)), float(ord(text[0]))]
+
+
+def test_repeated_texts_are_served_from_the_cache(local_generator):
+    generator, model = local_generator
+
+    generator.generate_batch(["lawn mowing", "bike repair"])
+    assert generator.generate("lawn mowing") == expected("lawn mowing")
+    assert generator.generate_batch(["bike repair"]) == [expected("bike repair")]
+
+    assert model.encoded == [["lawn mowing", "bike repair"]]
+
+
+def test_duplicate_texts_are_embedded_once(local_generator):
+    generator, model = local_generator
+
+    results = generator.generate_batch(["lawn", "bike", "lawn", "lawn"])
+
+    assert model.encoded == [["lawn", "bike"]]
+    assert results == [expected(t) for t in ["lawn", "bike", "lawn", "lawn"]]
+
+
+def test_results_follow_input_order_after_length_sort(local_generator):
+    generator, model = local_generator
+    texts = ["a much longer message", "hi", "medium text", "xyz", "hi"]
+
+    results = generator.generate_batch(texts)
+
+    # The model sees the distinct texts shortest first
+    assert model.encoded == [["hi", "xyz", "medium text", "a much longer message"]]
+    assert results == [expected(text) for text in texts]
+
+
+def test_least_recently_used_embedding_is_evicted(local_generator, monkeypatch):
+    generator, model = local_generator
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_SIZE", 2)
+
+    generator.generate_batch(["first", "second"])
+    generator.generate("first")  # Now "second" is the least recently used
+    generator.generate("third")
+    generator.generate_batch(["first", "second"])
+
+    assert model.encoded == [["first", "second"], ["third"], ["second"]]
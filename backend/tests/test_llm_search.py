@@ -0,0 +1,281 @@
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from locavox import config, llm_search
+from locavox.base_models import Message
+from locavox.llm_search import (
+    DEFAULT_COMPLETION_TOKENS,
+    SmartSearch,
+    TokenBucket,
+    _apply_ranking,
+    _create_completion,
+    _TopicFitCache,
+)
+
+TOPICS = [
+    ("Community Task Marketplace", "Local tasks and services exchange"),
+    ("Neighborhood Hub Chat", "General neighborhood discussions"),
+]
+
+
+@pytest.fixture
+def llm_reply(mock_openai):
+    """Make the mocked OpenAI client answer with the given content"""
+
+    def _reply(content):
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        completion = MagicMock()
+        completion.choices = [MagicMock()]
+        completion.choices[0].message.content = content
+        mock_openai.chat.completions.create = AsyncMock(return_value=completion)
+        return mock_openai.chat.completions.create
+
+    # Without a query vector the topic fit cache stays out of the way
+    with patch.object(SmartSearch, "_get_cache_vector", AsyncMock(return_value=None)):
+        yield _reply
+
+
+def make_messages(count: int):
+    return [
+        Message(
+            id=f"msg_{i}",
+            content=f"Message {i}",
+            userId="llm_user",
+            timestamp=datetime.now(),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_classify_topic_fit_batch_parses_scores(llm_reply):
+    create = llm_reply(
+        {
+            "topics": [
+                {"topic": 2, "score": 0.1, "explanation": " Chat, not tasks "},
+                {"topic": 1, "score": 1.7, "explanation": "Asks for help"},
+            ]
+        }
+    )
+
+    fits = await SmartSearch.classify_topic_fit_batch("who can mow my lawn", TOPICS)
+
+    # Matched by topic number, with scores clamped to 0-1
+    assert fits == [(1.0, "Asks for help"), (0.1, "Chat, not tasks")]
+    assert create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_classify_topic_fit_batch_missing_topic_is_neutral(llm_reply):
+    llm_reply({"topics": [{"topic": 1, "score": 0.8, "explanation": "Fits"}]})
+
+    fits = await SmartSearch.classify_topic_fit_batch("lawn mowing", TOPICS)
+
+    assert fits == [(0.8, "Fits"), (0.5, "")]
+
+
+@pytest.mark.asyncio
+async def test_classify_topic_fit_batch_malformed_json(llm_reply):
+    llm_reply("not json at all")
+
+    fits = await SmartSearch.classify_topic_fit_batch("lawn mowing", TOPICS)
+
+    assert fits == [(0.5, ""), (0.5, "")]
+
+
+@pytest.mark.asyncio
+async def test_classify_topic_fit_batch_ignores_bad_entries(llm_reply):
+    llm_reply(
+        {
+            "topics": [
+                {"topic": 0, "score": 0.9},
+                {"topic": 3, "score": 0.9},
+                {"topic": "two", "score": 0.9},
+                {"topic": 2, "score": "high"},
+                {"topic": 2, "score": 0.3},
+            ]
+        }
+    )
+
+    fits = await SmartSearch.classify_topic_fit_batch("lawn mowing", TOPICS)
+
+    assert fits == [(0.5, ""), (0.3, "")]
+
+
+@pytest.mark.asyncio
+async def test_rank_results_batch_orders_each_topic(llm_reply):
+    first, second = make_messages(3), make_messages(2)
+    llm_reply(
+        {
+            "topics": [
+                {
+                    "topic": 1,
+                    "ranking": [
+                        {"index": 3, "explanation": "Best match"},
+                        {"index": 1, "explanation": "Also relevant"},
+                    ],
+                },
+                {"topic": 2, "ranking": [{"index": 2, "explanation": "Only one"}]},
+            ]
+        }
+    )
+
+    rankings = await SmartSearch.rank_results_with_llm_batch(
+        "lawn", [first, second], limit=3
+    )
+
+    # Messages the LLM left out follow in search order
+    assert [item["message"] for item in rankings[0]] == [first[2], first[0], first[1]]
+    assert [item["explanation"] for item in rankings[0]] == [
+        "Best match",
+        "Also relevant",
+        "",
+    ]
+    assert [item["message"] for item in rankings[1]] == [second[1], second[0]]
+
+
+@pytest.mark.asyncio
+async def test_rank_results_batch_missing_topic_keeps_order(llm_reply):
+    first, second = make_messages(2), make_messages(2)
+    llm_reply({"topics": [{"topic": 1, "ranking": [{"index": 2}]}]})
+
+    rankings = await SmartSearch.rank_results_with_llm_batch("lawn", [first, second])
+
+    assert [item["message"] for item in rankings[0]] == [first[1], first[0]]
+    assert [item["message"] for item in rankings[1]] == second
+
+
+@pytest.mark.asyncio
+async def test_rank_results_batch_malformed_json_keeps_order(llm_reply):
+    first, second = make_messages(2), make_messages(3)
+    llm_reply('{"topics": [')
+
+    rankings = await SmartSearch.rank_results_with_llm_batch(
+        "lawn", [first, second], limit=2
+    )
+
+    assert [item["message"] for item in rankings[0]] == first
+    assert [item["message"] for item in rankings[1]] == second[:2]
+
+
+def test_apply_ranking_ignores_out_of_range_and_duplicate_indices():
+    messages = make_messages(3)
+    ranking = [
+        {"index": 0},
+        {"index": 99},
+        {"index": "x"},
+        {"explanation": "no index"},
+        {"index": "2", "explanation": "Second message"},
+        {"index": 2, "explanation": "Duplicate"},
+    ]
+
+    ranked = _apply_ranking(messages, ranking, limit=2)
+
+    assert [item["message"] for item in ranked] == [messages[1], messages[0]]
+    assert [item["explanation"] for item in ranked] == ["Second message", ""]
+    assert [item["relevance"] for item in ranked] == [1.0, 0.5]
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Drive TokenBucket with a manual clock, recording the sleeps it asks for"""
+    clock = SimpleNamespace(now=1000.0, sleeps=[])
+
+    async def sleep(seconds):
+        clock.sleeps.append(seconds)
+
+    monkeypatch.setattr(
+        llm_search, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    monkeypatch.setattr(llm_search, "asyncio", SimpleNamespace(sleep=sleep))
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_at_per_minute_rate(fake_clock):
+    bucket = TokenBucket(60)  # One token per second
+
+    await bucket.acquire(60)
+    assert fake_clock.sleeps == []
+
+    # Ten seconds later ten tokens are back, so five more don't wait
+    fake_clock.now += 10
+    await bucket.acquire(5)
+    assert fake_clock.sleeps == []
+
+    # The next ten need five seconds of refill
+    await bucket.acquire(10)
+    assert fake_clock.sleeps == [pytest.approx(5.0)]
+
+    # Refill never goes past the capacity: after an idle hour, one token more
+    # than a minute's worth still waits a second
+    fake_clock.now += 3600
+    await bucket.acquire(60)
+    await bucket.acquire(1)
+    assert fake_clock.sleeps == [pytest.approx(5.0), pytest.approx(1.0)]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_in_arrival_order(fake_clock):
+    bucket = TokenBucket(60)
+    await bucket.acquire(60)
+
+    # Each caller reserves its tokens on arrival, so later ones wait longer
+    await asyncio.gather(*(bucket.acquire(30) for _ in range(3)))
+
+    assert fake_clock.sleeps == [
+        pytest.approx(30.0),
+        pytest.approx(60.0),
+        pytest.approx(90.0),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "max_tokens, completion_tokens",
+    [(None, DEFAULT_COMPLETION_TOKENS), (50, 50)],
+)
+async def test_create_completion_counts_completion_tokens(
+    monkeypatch, fake_clock, max_tokens, completion_tokens
+):
+    monkeypatch.setattr(config, "OPENAI_RPM", None, raising=False)
+    monkeypatch.setattr(config, "OPENAI_TPM", 100_000, raising=False)
+    monkeypatch.setattr(llm_search, "_token_bucket", None)
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+
+    kwargs = {"messages": [{"role": "user", "content": "x" * 400}]}
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    await _create_completion(client, **kwargs)
+
+    # 400 characters of prompt plus the completion budget
+    prompt_tokens = 400 / llm_search.CHARS_PER_TOKEN
+    assert llm_search._token_bucket.tokens == pytest.approx(
+        100_000 - prompt_tokens - completion_tokens
+    )
+
+
+def test_topic_fit_cache_similarity_hit_counts_as_recent_use():
+    cache = _TopicFitCache(maxsize=2, threshold=0.9)
+    topic = TOPICS[0]
+    first, second, third = np.eye(3, dtype=np.float32)
+
+    cache.put(topic, "mow my lawn", first, (0.9, "Lawn"))
+    cache.put(topic, "fix my bike", second, (0.8, "Bike"))
+
+    # A paraphrase of the oldest entry hits it by similarity...
+    assert cache.get(topic, "lawn mowing please", first) == (0.9, "Lawn")
+
+    # ...so the next insert evicts the other entry instead
+    cache.put(topic, "paint my fence", third, (0.7, "Fence"))
+    assert cache.get(topic, "mow my lawn", None) == (0.9, "Lawn")
+    assert cache.get(topic, "fix my bike", None) is None
+    assert cache.get(topic, "bike repair", second) is None
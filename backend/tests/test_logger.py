@@ -0,0 +1,15 @@
+import logging
+
+from locavox.logger import setup_logger
+
+
+def test_module_loggers_reach_caplog(caplog):
+    logger = setup_logger("locavox.logger_test")
+
+    with caplog.at_level(logging.INFO):
+        logger.info("Visible to caplog")
+
+    assert "Visible to caplog" in caplog.text
+    # The record is printed by the "locavox" handler, not a second one here
+    assert not logger.handlers
+
@@ -43,8 +43,9 @@ def test_message():
 async def test_message_posting(test_topic, test_message):
     await test_topic.add_message(test_message)
 
-    assert len(test_topic.messages) == 1
-    assert test_topic.messages[0].content == test_message.content
+    messages = await test_topic.get_messages()
+    assert len(messages) == 1
+    assert messages[0].content == test_message.content
 
     stored_messages = await test_topic.search_messages(test_message.content)
     assert len(stored_messages) == 1
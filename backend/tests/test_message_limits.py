@@ -1,10 +1,20 @@
+import uuid
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
 from locavox.main import app
+from locavox.base_models import Message
 from locavox.models import BaseTopic
 from locavox import config
 from locavox.logger import setup_logger
 from locavox.config_helpers import set_test_value, reset_test_values
+from locavox.main import (
+    _warmed_users,
+    count_user_messages,
+    reset_user_message_counts,
+    user_message_counts,
+)
 
 # Set up logger for tests
 logger = setup_logger("tests.message_limits")
@@ -23,10 +33,9 @@ def test_limit():
 
 
 @pytest.fixture(autouse=True)
-async def setup_test_environment(event_loop, test_limit):
+def setup_test_environment(test_limit):
     """Setup test environment with a clean topic"""
     from locavox.main import topics
-    from locavox.config_helpers import set_test_value, reset_test_values
 
     # Store original limit value
     original_limit = config.MAX_MESSAGES_PER_USER
@@ -43,6 +52,7 @@ async def setup_test_environment(event_loop, test_limit):
         # Create clean test topics
         topics.clear()
         topics["test_topic"] = BaseTopic("test_topic")
+        reset_user_message_counts()
 
         # Verify the limit was set correctly in both places
         from locavox.config_helpers import get_message_limit
@@ -239,3 +249,91 @@ async def test_message_limits_on_base_topic_subclasses(client, test_limit):
     assert response.status_code == 200
     data = response.json()
     assert data["total"] == test_limit
+
+
+def make_message(user_id: str, content: str) -> Message:
+    return Message(
+        id=str(uuid.uuid4()),
+        content=content,
+        userId=user_id,
+        timestamp=datetime.now(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_user_count_warm_up_and_increment(client):
+    """Counts are loaded from storage once, then kept in step by add_message"""
+    from locavox.main import topics
+
+    user_id = "count_cache_user"
+    for i in range(2):
+        await topics["test_topic"].add_message(make_message(user_id, f"Stored {i}"))
+
+    # A limit far away from the count is answered from the cache
+    assert await count_user_messages(user_id, 100) == 2
+    assert user_id in _warmed_users
+
+    response = client.post(
+        "/topics/test_topic/messages?test_limit=100",
+        json={"userId": user_id, "content": "Counted locally"},
+    )
+    assert response.status_code == 200
+    assert user_message_counts[user_id] == 3
+
+
+@pytest.mark.asyncio
+async def test_new_empty_topic_keeps_user_counts(client):
+    """A new, empty topic adds nothing, so the cached counts are kept"""
+    user_id = "new_topic_user"
+    assert await count_user_messages(user_id, 100) == 0
+    assert user_id in _warmed_users
+
+    response = client.post(
+        "/topics/brand_new_topic/messages?test_limit=100",
+        json={"userId": user_id, "content": "First message in a new topic"},
+    )
+    assert response.status_code == 200
+    assert user_id in _warmed_users
+    assert user_message_counts[user_id] == 1
+
+
+@pytest.mark.asyncio
+async def test_topic_with_stored_messages_resets_user_counts(client):
+    """A topic whose table already holds messages makes the counts reload"""
+    user_id = "leftover_topic_user"
+    assert await count_user_messages(user_id, 100) == 0
+
+    # Messages left in the topic's table by an earlier run
+    await BaseTopic("leftover_topic").add_message(make_message(user_id, "Old"))
+
+    response = client.post(
+        "/topics/leftover_topic/messages?test_limit=100",
+        json={"userId": user_id, "content": "New"},
+    )
+    assert response.status_code == 200
+    assert user_id not in _warmed_users
+
+    # The next check reloads the count from storage, old message included
+    assert await count_user_messages(user_id, 100) == 2
+    assert user_id in _warmed_users
+
+
+@pytest.mark.asyncio
+async def test_count_near_limit_sees_other_workers(client, test_limit):
+    """Near the limit, messages written through another connection are counted"""
+    user_id = "multi_worker_user"
+    assert await count_user_messages(user_id, test_limit) == 0
+
+    # Another worker process has its own connection to the same table
+    other_worker_topic = BaseTopic("test_topic")
+    for i in range(test_limit):
+        await other_worker_topic.add_message(
+            make_message(user_id, f"Written elsewhere {i}")
+        )
+
+    response = client.post(
+        f"/topics/test_topic/messages?test_limit={test_limit}",
+        json={"userId": user_id, "content": "This message should be rejected"},
+    )
+    assert response.status_code == 429
+    assert user_message_counts[user_id] == test_limit
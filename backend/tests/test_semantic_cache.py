@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from locavox.semantic_cache import SemanticCache
+
+VERSION = ("topic", 1)
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(maxsize=3, threshold=0.95)
+
+
+def unit_vector(index: int, dim: int = 8) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+
+def test_exact_hit(cache):
+    cache.put("bike repair", {"query": "bike repair"}, VERSION)
+
+    assert cache.get("bike repair", VERSION) == {"query": "bike repair"}
+    assert cache.get("Bike repair", VERSION) is None
+
+
+def test_entries_without_vector_never_match_by_similarity(cache):
+    cache.put("bike repair", "plain", VERSION)
+
+    assert cache.get_similar(unit_vector(0), VERSION) is None
+
+
+def test_similarity_threshold(cache):
+    cache.put("bike repair", "cached", VERSION, unit_vector(0))
+
+    # Nearly the same direction is a hit
+    close = unit_vector(0) + 0.05 * unit_vector(1)
+    assert cache.get_similar(close, VERSION) == "cached"
+
+    # Below the threshold is a miss
+    far = unit_vector(0) + unit_vector(1)
+    assert cache.get_similar(far, VERSION) is None
+    assert cache.get_similar(unit_vector(2), VERSION) is None
+
+
+def test_lru_eviction(cache):
+    for i in range(3):
+        cache.put(f"query {i}", i, VERSION, unit_vector(i))
+
+    # Using the oldest entry makes "query 1" the least recently used
+    assert cache.get("query 0", VERSION) == 0
+    cache.put("query 3", 3, VERSION, unit_vector(3))
+
+    assert len(cache) == 3
+    assert cache.get("query 1", VERSION) is None
+    assert cache.get_similar(unit_vector(1), VERSION) is None
+    assert cache.get("query 0", VERSION) == 0
+    assert cache.get_similar(unit_vector(3), VERSION) == 3
+
+
+def test_version_change_drops_entries(cache):
+    cache.put("bike repair", "cached", VERSION, unit_vector(0))
+
+    new_version = ("topic", 2)
+    assert cache.get("bike repair", new_version) is None
+    assert cache.get_similar(unit_vector(0), new_version) is None
+    assert len(cache) == 0
+
+    # Going back to the old version doesn't bring the entry back either
+    assert cache.get("bike repair", VERSION) is None
@@ -263,3 +263,51 @@ async def test_add_and_retrieve_user_message(setup_test_data):
     assert data["messages"][0]["message"]["id"] == new_message_id
     assert data["messages"][0]["message"]["content"] == new_message["content"]
     assert data["messages"][0]["topic"]["name"] == topic_names[0]
+
+
+@pytest.mark.asyncio
+async def test_user_messages_merged_across_topics_by_page():
+    """Pages merge each topic's newest messages into one newest-first list"""
+    from locavox.main import topics
+
+    user_id = f"paging_user_{uuid.uuid4()}"
+    topics.clear()
+    topics["paging_a"] = BaseTopic("paging_a")
+    topics["paging_b"] = BaseTopic("paging_b")
+
+    # Interleave the timestamps so every page mixes both topics
+    now = datetime.now()
+    expected = []
+    for minutes in range(8):
+        topic_name = "paging_a" if minutes % 2 == 0 or minutes > 5 else "paging_b"
+        message = Message(
+            id=str(uuid.uuid4()),
+            userId=user_id,
+            content=f"Message {minutes} minutes old",
+            timestamp=now - timedelta(minutes=minutes),
+        )
+        await topics[topic_name].add_message(message)
+        expected.append((message.id, topic_name))
+    # Another user's messages must not show up or count
+    await topics["paging_b"].add_message(
+        Message(
+            id=str(uuid.uuid4()),
+            userId="someone_else",
+            content="Not part of the results",
+            timestamp=now,
+        )
+    )
+
+    pages = []
+    for skip in (0, 3, 6, 8):
+        response = client.get(f"/users/{user_id}/messages?skip={skip}&limit=3")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 8
+        assert data["skip"] == skip
+        assert data["limit"] == 3
+        pages.append(
+            [(msg["message"]["id"], msg["topic"]["name"]) for msg in data["messages"]]
+        )
+
+    assert pages == [expected[0:3], expected[3:6], expected[6:8], []]
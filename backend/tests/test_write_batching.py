@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from locavox.base_models import Message
+from locavox.models import WRITE_BATCH_SIZE, BaseTopic
+
+
+@pytest.fixture
+def topic():
+    """Topic whose storage only records the batches written to it"""
+    topic = BaseTopic("batching_topic", initialize=False)
+    topic.storage = MagicMock()
+    topic.storage.table = MagicMock()  # Already initialized
+    topic.storage.add_messages = AsyncMock()
+    return topic
+
+
+def make_messages(count: int):
+    return [
+        Message(
+            id=f"msg_{i}",
+            content=f"Message {i}",
+            userId="batch_user",
+            timestamp=datetime.now(),
+        )
+        for i in range(count)
+    ]
+
+
+def written_batches(topic):
+    return [call.args[0] for call in topic.storage.add_messages.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_batch(topic):
+    messages = make_messages(5)
+
+    results = await asyncio.gather(*(topic.add_message(m) for m in messages))
+
+    # Every caller gets its own message back once it is stored
+    assert results == messages
+    assert written_batches(topic) == [messages]
+
+
+@pytest.mark.asyncio
+async def test_sequential_writes_are_not_held_back(topic):
+    messages = make_messages(2)
+
+    for message in messages:
+        await topic.add_message(message)
+
+    assert written_batches(topic) == [[messages[0]], [messages[1]]]
+
+
+@pytest.mark.asyncio
+async def test_storage_error_reaches_every_caller(topic):
+    topic.storage.add_messages.side_effect = RuntimeError("disk full")
+
+    results = await asyncio.gather(
+        *(topic.add_message(m) for m in make_messages(3)), return_exceptions=True
+    )
+
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert topic.storage.add_messages.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_large_bursts_are_split_into_batches(topic):
+    messages = make_messages(WRITE_BATCH_SIZE + 44)
+
+    await asyncio.gather(*(topic.add_message(m) for m in messages))
+
+    batches = written_batches(topic)
+    assert [len(batch) for batch in batches] == [WRITE_BATCH_SIZE, 44]
+    assert [m for batch in batches for m in batch] == messages